@@ -20,9 +20,10 @@ Misha Schwartz, and Jaisie Sin
 === Module Description ===
 
 This file contains the different actions that can be made by a Player.
-"""
-import pygame
 
+The keys that human players press for each action are in controls.py, so that
+this file can be used without pygame.
+"""
 # Actions that can be performed in the game
 ROTATE_CLOCKWISE = ('rotate', 1)
 ROTATE_COUNTER_CLOCKWISE = ('rotate', 3)
@@ -55,6 +56,18 @@ ACTION_MESSAGE = {
     PASS: 'passing'
 }
 
+# The image shown while each action is being animated
+ACTION_IMAGE = {
+    ROTATE_CLOCKWISE: 'images/rotate-cw.png',
+    ROTATE_COUNTER_CLOCKWISE: 'images/rotate-ccw.png',
+    SWAP_HORIZONTAL: 'images/swap-horizontal.png',
+    SWAP_VERTICAL: 'images/swap-vertical.png',
+    SMASH: 'images/smash.png',
+    COMBINE: 'images/combine.png',
+    PAINT: 'images/paint.png',
+    PASS: 'images/pass.png'
+}
+
 ACTION_PENALTY = {
     ROTATE_CLOCKWISE: 0,
     ROTATE_COUNTER_CLOCKWISE: 0,
@@ -66,16 +79,14 @@ ACTION_PENALTY = {
     PASS: 0
 }
 
-ACTION_KEY = {
-    ROTATE_CLOCKWISE: pygame.K_d,
-    ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
-    SWAP_HORIZONTAL: pygame.K_q,
-    SWAP_VERTICAL: pygame.K_e,
-    SMASH: pygame.K_SPACE,
-    COMBINE: pygame.K_c,
-    PAINT: pygame.K_r,
-    PASS: pygame.K_TAB
-}
-
-# Create a dictionary that is ACTION_KEY inverted
-KEY_ACTION = {value: key for key, value in ACTION_KEY.items()}
+# All of the actions, in the order that keys are listed for them
+ACTIONS = [
+    ROTATE_CLOCKWISE,
+    ROTATE_COUNTER_CLOCKWISE,
+    SWAP_HORIZONTAL,
+    SWAP_VERTICAL,
+    SMASH,
+    COMBINE,
+    PAINT,
+    PASS
+]
@@ -0,0 +1,199 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains functions that score many boards at once using NumPy.
+
+Boards are flattened into grids of colour indices (positions in COLOUR_LIST)
+that follow the same layout as goal._flatten: grid[i][j] is the unit cell at
+column i and row j. Many grids of the same size are stacked into a single
+array of shape (N, S, S) so that every goal can be computed for all N boards
+in a handful of vectorised passes.
+"""
+from __future__ import annotations
+from typing import List, Optional
+
+import numpy as np
+
+from block import Block
+from goal import Goal, PerimeterGoal, BlobGoal
+from settings import COLOUR_LIST
+
+# The index used for a cell whose colour is not in COLOUR_LIST
+NO_COLOUR = 255
+
+_COLOUR_INDEX = {colour: i for i, colour in enumerate(COLOUR_LIST)}
+
+
+def colour_index(colour: Optional[tuple]) -> int:
+    """Return the index of <colour> in COLOUR_LIST, or NO_COLOUR if it is not
+    in COLOUR_LIST.
+
+    >>> colour_index(COLOUR_LIST[2])
+    2
+    >>> colour_index((0, 0, 0)) == NO_COLOUR
+    True
+    """
+    return _COLOUR_INDEX.get(colour, NO_COLOUR)
+
+
+def flatten_indices(block: Block, out: Optional[np.ndarray] = None) \
+        -> np.ndarray:
+    """Return a square array of the colour indices of the unit cells of
+    <block>, laid out like goal._flatten.
+
+    If <out> is given, the cells are written into it instead of a new array.
+
+    Precondition: <out> is None or has shape (2^k, 2^k) where
+    k = block.max_depth - block.level
+    """
+    size = 2 ** (block.max_depth - block.level)
+    if out is None:
+        out = np.empty((size, size), dtype=np.uint8)
+    _fill(block, out, 0, 0, size)
+    return out
+
+
+def _fill(block: Block, grid: np.ndarray, x: int, y: int, size: int) -> None:
+    """Write the colour indices of <block> into the <size> by <size> region
+    of <grid> whose upper left unit cell is at column <x> and row <y>.
+    """
+    if not block.children or size == 1:
+        grid[x:x + size, y:y + size] = colour_index(block.colour)
+        return
+    half = size // 2
+    ur, ul, ll, lr = block.children
+    _fill(ur, grid, x + half, y, half)
+    _fill(ul, grid, x, y, half)
+    _fill(ll, grid, x, y + half, half)
+    _fill(lr, grid, x + half, y + half, half)
+
+
+def stack_boards(boards: List[Block]) -> np.ndarray:
+    """Return an array of shape (N, S, S) holding the flattened colour indices
+    of each of the N <boards>.
+
+    Precondition:
+        - len(boards) >= 1
+        - all boards have the same max_depth and level
+    """
+    size = 2 ** (boards[0].max_depth - boards[0].level)
+    grids = np.empty((len(boards), size, size), dtype=np.uint8)
+    for i, board in enumerate(boards):
+        _fill(board, grids[i], 0, 0, size)
+    return grids
+
+
+def perimeter_scores(grids: np.ndarray, index: int) -> np.ndarray:
+    """Return the PerimeterGoal score of each grid in <grids> for the colour
+    with <index> in COLOUR_LIST.
+
+    As with PerimeterGoal, corner cells count twice.
+    """
+    mask = grids == index
+    return mask[:, 0, :].sum(axis=1) + mask[:, -1, :].sum(axis=1) + \
+        mask[:, :, 0].sum(axis=1) + mask[:, :, -1].sum(axis=1)
+
+
+def blob_scores(grids: np.ndarray, index: int) -> np.ndarray:
+    """Return the BlobGoal score of each grid in <grids> for the colour with
+    <index> in COLOUR_LIST.
+
+    Every cell of the target colour is labelled with the position of a cell
+    in the same blob of its grid (at first, itself). Labels are
+    repeatedly replaced by the smallest label among their neighbours, and then
+    by the label of the cell they point to, until each blob shares a single
+    label. Following labels like this lets a long blob agree on its label in
+    far fewer passes than the length of the blob. The score is then the size
+    of the most common label on each grid.
+    """
+    n, size, _ = grids.shape
+    cells = size * size
+    mask = grids == index
+    if not mask.any():
+        return np.zeros(n, dtype=np.int64)
+
+    # Labels are positions within each grid. Cells that are not of the target
+    # colour are labelled with <cells>, which points to itself.
+    labels = np.where(mask, np.arange(cells, dtype=np.int32).reshape(
+        1, size, size), np.int32(cells))
+    # The grids whose labels are still changing
+    active = np.arange(n)
+    while active.size:
+        current = labels[active]
+        smallest = current.copy()
+        np.minimum(smallest[:, 1:, :], current[:, :-1, :],
+                   out=smallest[:, 1:, :])
+        np.minimum(smallest[:, :-1, :], current[:, 1:, :],
+                   out=smallest[:, :-1, :])
+        np.minimum(smallest[:, :, 1:], current[:, :, :-1],
+                   out=smallest[:, :, 1:])
+        np.minimum(smallest[:, :, :-1], current[:, :, 1:],
+                   out=smallest[:, :, :-1])
+        smallest[~mask[active]] = cells
+
+        table = np.empty((active.size, cells + 1), dtype=np.int32)
+        table[:, :cells] = smallest.reshape(active.size, cells)
+        table[:, cells] = cells
+        smallest = np.take_along_axis(table, table[:, :cells], axis=1)
+        smallest = np.take_along_axis(table, smallest, axis=1)
+
+        changed = (smallest != current.reshape(active.size, cells)).any(
+            axis=1)
+        labels[active] = smallest.reshape(active.size, size, size)
+        active = active[changed]
+
+    keys = (np.arange(n).reshape(n, 1, 1) * cells + labels)[mask]
+    counts = np.bincount(keys, minlength=n * cells).reshape(n, cells)
+    return counts.max(axis=1)
+
+
+def score_grids(goal: Goal, grids: np.ndarray) -> np.ndarray:
+    """Return the score of <goal> on each grid in <grids>.
+
+    Raise a TypeError if <goal> is neither a PerimeterGoal nor a BlobGoal.
+    """
+    index = colour_index(goal.colour)
+    if isinstance(goal, PerimeterGoal):
+        return perimeter_scores(grids, index)
+    elif isinstance(goal, BlobGoal):
+        return blob_scores(grids, index)
+    raise TypeError(f'Cannot batch-score {type(goal).__name__}')
+
+
+def score_boards(goal: Goal, boards: List[Block]) -> List[int]:
+    """Return the score of <goal> on each of <boards>, in order.
+
+    This gives the same results as calling goal.score on every board, but is
+    much faster when there are many boards to score. It can be given to a
+    SmartPlayer as its batch scorer.
+    """
+    return score_grids(goal, stack_boards(boards)).tolist()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'numpy', 'block',
+            'goal', 'settings'
+        ]
+    })
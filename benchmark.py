@@ -0,0 +1,539 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains benchmarks of the core Block and Goal operations, run on
+boards of every max_depth from 2 to 8, and a benchmark of how long each type
+of computer player takes to choose its moves in headless games.
+
+Every benchmark is run on the same randomly generated boards each time, by
+seeding the random module before each one. Each operation is timed on its
+own, so that setting up its arguments (for example, making a fresh Block to
+smash) is not counted.
+
+Results are written as JSON:
+
+    {"meta": {...},
+     "results": {"<benchmark>": {"<max_depth>": {"median": seconds, ...}}}}
+
+and can be compared against a baseline file written by an earlier run, which
+reports every benchmark whose median time grew by more than a threshold.
+
+The turn benchmark plays headless games (see simulator.py) between a
+RandomPlayer and the player being timed, and reports the 50th, 95th and 99th
+percentile time of that player's generate_move, the number of moves it can
+generate per second, and the median number of bytes allocated at once while
+generating a move, as traced by tracemalloc (see footprint.py). Memory is
+measured by playing the same game a second time, so that tracing does not slow
+down the timed moves. Its results use the same format, with each player type as
+a benchmark, so that they can be compared in the same way.
+
+The memory benchmark reports, for a board of each max_depth, the bytes used
+per Block and per Block of a copy (as 'Block'), and for each type of computer
+player, the peak memory allocated while generating a move and the memory
+retained across turns, as measured by footprint.py. Regressions in memory are
+found by comparing the bytes per Block and the peak bytes instead of the
+median time.
+
+Run it from the command line:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+    python benchmark.py --turns --depths 2-5 --output turns.json
+    python benchmark.py --memory --compare memory.json
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# Keep pygame, which blocky imports, from printing to the JSON output
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from block import Block, generate_board
+from blocky import _block_to_squares
+from footprint import Move, create_turn_game, measure_board, measure_turns, \
+    play_turns
+from goal import BlobGoal, PerimeterGoal, _flatten
+from player import _get_block
+from settings import BOARD_SIZE, COLOUR_LIST
+
+DEPTHS = list(range(2, 9))
+
+# The max_depths that the turn benchmark is run on by default
+TURN_DEPTHS = list(range(2, 6))
+
+# The player types timed by the turn benchmark, mapped to the difficulty of
+# the SmartPlayer, or None for a RandomPlayer
+PLAYER_TYPES = {
+    'RandomPlayer': None,
+    'SmartPlayer(1)': 1,
+    'SmartPlayer(10)': 10,
+    'SmartPlayer(100)': 100,
+    'SmartPlayer(1000)': 1000
+}
+
+# A benchmark takes a board and returns a function that sets up the arguments
+# of one run, and the operation to time, which is called with them
+Benchmark = Callable[[Block], Tuple[Callable[[], Any], Callable[[Any], Any]]]
+
+
+def _generate_board(board: Block) -> Tuple[Callable[[], Any],
+                                           Callable[[Any], Any]]:
+    return lambda: None, lambda _: generate_board(board.max_depth, BOARD_SIZE)
+
+
+def _create_copy(board: Block) -> Tuple[Callable[[], Any],
+                                        Callable[[Any], Any]]:
+    return lambda: board, Block.create_copy
+
+
+def _smash(board: Block) -> Tuple[Callable[[], Any], Callable[[Any], Any]]:
+    # Smash a leaf the size of one of the board's children
+    def setup() -> Block:
+        return Block((0, 0), board.size // 2, COLOUR_LIST[0], 1,
+                     board.max_depth)
+    return setup, Block.smash
+
+
+def _rotate(board: Block) -> Tuple[Callable[[], Any], Callable[[Any], Any]]:
+    return lambda: board, lambda b: b.rotate(1)
+
+
+def _swap(board: Block) -> Tuple[Callable[[], Any], Callable[[Any], Any]]:
+    return lambda: board, lambda b: b.swap(0)
+
+
+def _combine(board: Block) -> Tuple[Callable[[], Any], Callable[[Any], Any]]:
+    # Combine a Block just above the bottom level, with four unit cells
+    size = BOARD_SIZE // 2 ** (board.max_depth - 1)
+
+    def setup() -> Block:
+        block = Block((0, 0), size, None, board.max_depth - 1,
+                      board.max_depth)
+        block.children = [Block(pos, block._child_size(), colour,
+                                board.max_depth, board.max_depth)
+                          for pos, colour in zip(block._children_positions(),
+                                                 [COLOUR_LIST[0]] * 3 +
+                                                 [COLOUR_LIST[1]])]
+        return block
+    return setup, Block.combine
+
+
+def _flatten_board(board: Block) -> Tuple[Callable[[], Any],
+                                          Callable[[Any], Any]]:
+    return lambda: board, _flatten
+
+
+def _perimeter_score(board: Block) -> Tuple[Callable[[], Any],
+                                            Callable[[Any], Any]]:
+    return lambda: board, PerimeterGoal(COLOUR_LIST[0]).score
+
+
+def _blob_score(board: Block) -> Tuple[Callable[[], Any],
+                                       Callable[[Any], Any]]:
+    return lambda: board, BlobGoal(COLOUR_LIST[0]).score
+
+
+def _get_block_at(board: Block) -> Tuple[Callable[[], Any],
+                                         Callable[[Any], Any]]:
+    # Look up a random position at the deepest level, using a seeded
+    # generator so that the positions are the same every run
+    rng = random.Random(0)
+
+    def setup() -> Tuple[int, int]:
+        return rng.randrange(board.size), rng.randrange(board.size)
+    return setup, lambda pos: _get_block(board, pos, board.max_depth)
+
+
+def _squares(board: Block) -> Tuple[Callable[[], Any],
+                                    Callable[[Any], Any]]:
+    return lambda: board, _block_to_squares
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    'generate_board': _generate_board,
+    'create_copy': _create_copy,
+    'smash': _smash,
+    'rotate': _rotate,
+    'swap': _swap,
+    'combine': _combine,
+    '_flatten': _flatten_board,
+    'PerimeterGoal.score': _perimeter_score,
+    'BlobGoal.score': _blob_score,
+    '_get_block': _get_block_at,
+    '_block_to_squares': _squares
+}
+
+
+@contextlib.contextmanager
+def _recursion_limit(depth: int) -> Iterator[None]:
+    """Raise the recursion limit inside the with block, so that it is enough
+    to visit every unit cell of a board of max_depth <depth> recursively.
+
+    BlobGoal makes one nested call for each cell of a blob, and a blob can
+    cover the whole board, which the default limit does not allow beyond a
+    max_depth of about 5.
+    """
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(limit + 4 ** depth)
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def time_benchmark(benchmark: Benchmark, board: Block,
+                   min_time: float = 0.1, max_runs: int = 1000) \
+        -> Dict[str, float]:
+    """Return timings, in seconds, of <benchmark> on <board>.
+
+    The operation is run at least 3 times, and then until it has taken
+    <min_time> seconds in total or has run <max_runs> times.
+    """
+    setup, operation = benchmark(board)
+    times = []
+    total = 0.0
+    while len(times) < 3 or (total < min_time and len(times) < max_runs):
+        argument = setup()
+        start = time.perf_counter()
+        operation(argument)
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+    return {
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'min': min(times),
+        'runs': len(times)
+    }
+
+
+def run_benchmarks(depths: Optional[List[int]] = None,
+                   names: Optional[List[str]] = None, seed: int = 0,
+                   min_time: float = 0.1) -> Dict[str, Any]:
+    """Run the benchmarks called <names> on a board of each max_depth in
+    <depths>, and return the results in the format described at the top of
+    this file.
+
+    If <depths> or <names> is None, every max_depth in DEPTHS or every
+    benchmark in BENCHMARKS is run. The recursion limit is raised to fit
+    each board, and a benchmark that still raises an error on a board
+    records the name of the error instead of its timings.
+    """
+    depths = DEPTHS if depths is None else depths
+    names = list(BENCHMARKS) if names is None else names
+    results = {}
+    for name in names:
+        results[name] = {}
+        for depth in depths:
+            # Every benchmark starts from the same board and random state
+            random.seed(seed + depth)
+            board = generate_board(depth, BOARD_SIZE)
+            try:
+                with _recursion_limit(depth):
+                    timing = time_benchmark(BENCHMARKS[name], board,
+                                            min_time)
+            except RecursionError as e:
+                timing = {'error': type(e).__name__}
+            results[name][str(depth)] = timing
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'min_time': min_time,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Return the <percent>th percentile of <values>, using the nearest rank.
+
+    >>> _percentile([4.0, 1.0, 3.0, 2.0], 50)
+    2.0
+    >>> _percentile([4.0, 1.0, 3.0, 2.0], 99)
+    4.0
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def time_turns(difficulty: Optional[int], depth: int, num_turns: int,
+               seed: int = 0) -> Dict[str, float]:
+    """Return timings of the moves of a player in a game against a
+    RandomPlayer on a board of <depth>, for <num_turns> turns.
+
+    The player is a SmartPlayer with <difficulty>, or a RandomPlayer if
+    <difficulty> is None. The game is played in a Simulator, as a headless
+    game is, and times are in seconds. The memory allocated by each move is
+    measured by footprint.measure_turns, in the same game played again.
+    """
+    data, timed = create_turn_game(difficulty, depth, seed)
+    times = []
+
+    def measure(generate: Callable[[], Optional[Move]]) -> Optional[Move]:
+        start = time.perf_counter()
+        move = generate()
+        times.append(time.perf_counter() - start)
+        return move
+
+    play_turns(data, timed, num_turns, measure)
+    usage = measure_turns(difficulty, depth, num_turns, seed)
+    return {
+        'median': _percentile(times, 50),
+        'p95': _percentile(times, 95),
+        'p99': _percentile(times, 99),
+        'moves_per_sec': len(times) / sum(times),
+        'peak_bytes_per_move': usage['peak_bytes'],
+        'runs': len(times)
+    }
+
+
+def run_turn_benchmarks(depths: Optional[List[int]] = None,
+                        names: Optional[List[str]] = None,
+                        num_turns: int = 20, seed: int = 0) -> Dict[str, Any]:
+    """Time the moves of the player types called <names>, in games of
+    <num_turns> turns on a board of each max_depth in <depths>, and return the
+    results in the format described at the top of this file.
+
+    If <depths> or <names> is None, every max_depth in TURN_DEPTHS or every
+    player type in PLAYER_TYPES is run.
+    """
+    depths = TURN_DEPTHS if depths is None else depths
+    names = list(PLAYER_TYPES) if names is None else names
+    results = {}
+    for name in names:
+        results[name] = {}
+        for depth in depths:
+            try:
+                with _recursion_limit(depth):
+                    timing = time_turns(PLAYER_TYPES[name], depth, num_turns,
+                                        seed)
+            except RecursionError as e:
+                timing = {'error': type(e).__name__}
+            results[name][str(depth)] = timing
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'num_turns': num_turns,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+
+def run_memory_benchmarks(depths: Optional[List[int]] = None,
+                          names: Optional[List[str]] = None,
+                          num_turns: int = 20,
+                          seed: int = 0) -> Dict[str, Any]:
+    """Measure the memory used by boards, and by the player types called
+    <names> in games of <num_turns> turns, on a board of each max_depth in
+    <depths>, and return the results in the format described at the top of
+    this file.
+
+    If <depths> or <names> is None, every max_depth in TURN_DEPTHS or every
+    player type in PLAYER_TYPES is run.
+    """
+    depths = TURN_DEPTHS if depths is None else depths
+    names = list(PLAYER_TYPES) if names is None else names
+    results = {'Block': {str(depth): measure_board(depth, seed)
+                         for depth in depths}}
+    for name in names:
+        results[name] = {}
+        for depth in depths:
+            try:
+                with _recursion_limit(depth):
+                    usage = measure_turns(PLAYER_TYPES[name], depth,
+                                          num_turns, seed)
+            except RecursionError as e:
+                usage = {'error': type(e).__name__}
+            results[name][str(depth)] = usage
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'num_turns': num_turns,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = 0.25, columns: Tuple[str, ...] = ('median',)) \
+        -> List[Tuple[str, str, float, float]]:
+    """Return the benchmarks in <results> whose value in one of <columns>
+    is more than <threshold> (as a fraction) larger than in <baseline>.
+
+    The first of <columns> that a benchmark has in both sets of results is
+    compared, so that, for example, ('median', 'bytes_per_node') compares
+    the median time of the timed benchmarks and the memory used by each node
+    of the memory benchmarks. Each regression is a tuple of the benchmark
+    name, the max_depth, the baseline value and the new value. Benchmarks
+    that are missing from either set of results, that raised an error, or
+    that have none of <columns> are skipped.
+    """
+    regressions = []
+    for name, by_depth in results['results'].items():
+        for depth, timing in by_depth.items():
+            old = baseline['results'].get(name, {}).get(depth, {})
+            for column in columns:
+                if column in timing and column in old:
+                    if timing[column] > old[column] * (1 + threshold):
+                        regressions.append((name, depth, old[column],
+                                            timing[column]))
+                    break
+    return regressions
+
+
+def _print_results(results: Dict[str, Any],
+                   column: str = 'median') -> None:
+    """Print the <column> of every benchmark in <results>, with one column
+    per max_depth, to standard error. Times are printed in microseconds.
+
+    Benchmarks that do not have the column, and did not raise an error, are
+    left out.
+    """
+    scale = 1e6 if column in ('median', 'p95', 'p99') else 1
+    depths = sorted({int(d) for by_depth in results['results'].values()
+                     for d in by_depth})
+    print(f'{column:<20}' + ''.join(f'{d:>15}' for d in depths),
+          file=sys.stderr)
+    for name, by_depth in results['results'].items():
+        if not any(column in timing or 'error' in timing
+                   for timing in by_depth.values()):
+            continue
+        cells = []
+        for d in depths:
+            timing = by_depth.get(str(d), {})
+            if column in timing:
+                cells.append(f'{timing[column] * scale:>15.1f}')
+            else:
+                cells.append(f'{timing.get("error", "-"):>15}')
+        print(f'{name:<20}' + ''.join(cells), file=sys.stderr)
+
+
+def _parse_depths(text: str) -> List[int]:
+    """Return the max_depths in <text>, which is either one depth like '5' or
+    a range like '2-8'.
+
+    >>> _parse_depths('2-4')
+    [2, 3, 4]
+    """
+    if '-' in text:
+        low, high = text.split('-')
+        return list(range(int(low), int(high) + 1))
+    return [int(text)]
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    """Run the benchmarks as asked by the command line <args>, and return the
+    exit status: 1 if any benchmark regressed against the baseline, or 0.
+    """
+    parser = argparse.ArgumentParser(
+        description='Time the core Block and Goal operations.')
+    parser.add_argument('--turns', action='store_true',
+                        help='time the moves of each type of computer player '
+                             'instead')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure the memory used by boards and by each '
+                             'type of computer player instead')
+    parser.add_argument('--depths', type=_parse_depths,
+                        help='a max_depth or a range of them, like 2-8 '
+                             '(default: 2-8, or 2-5 with --turns or '
+                             '--memory)')
+    parser.add_argument('--only', nargs='+',
+                        choices=list(BENCHMARKS) + list(PLAYER_TYPES),
+                        help='the benchmarks or player types to run '
+                             '(default: all)')
+    parser.add_argument('--num-turns', type=int, default=20,
+                        help='turns per game with --turns or --memory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-time', type=float, default=0.1,
+                        help='seconds to spend timing each benchmark')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='report regressions against this results file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='the slowdown, as a fraction, that counts as a '
+                             'regression')
+    options = parser.parse_args(args)
+
+    columns = ('median',)
+    if options.memory:
+        results = run_memory_benchmarks(options.depths, options.only,
+                                        options.num_turns, options.seed)
+        columns = ('bytes_per_node', 'peak_bytes')
+    elif options.turns:
+        results = run_turn_benchmarks(options.depths, options.only,
+                                      options.num_turns, options.seed)
+    else:
+        results = run_benchmarks(options.depths, options.only, options.seed,
+                                 options.min_time)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if options.memory:
+        for column in ('bytes_per_node', 'copy_bytes_per_node', 'peak_bytes',
+                       'max_peak_bytes', 'retained_per_turn'):
+            _print_results(results, column)
+    elif options.turns:
+        for column in ('median', 'p95', 'p99', 'moves_per_sec',
+                       'peak_bytes_per_move'):
+            _print_results(results, column)
+    else:
+        _print_results(results)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, options.threshold, columns)
+        for name, depth, old, new in regressions:
+            if options.memory:
+                change = f'{old:.0f} bytes -> {new:.0f} bytes'
+            else:
+                change = f'{old * 1e6:.1f}us -> {new * 1e6:.1f}us'
+            print(f'REGRESSION {name} at max_depth {depth}: {change} '
+                  f'({new / old - 1:+.0%})', file=sys.stderr)
+        if regressions:
+            return 1
+        print('No regressions', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
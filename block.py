@@ -22,17 +22,55 @@ Misha Schwartz, and Jaisie Sin
 This file contains the Block class, the main data structure used in the game.
 """
 from __future__ import annotations
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List
 import random
 import math
 
 from settings import colour_name, COLOUR_LIST
 
+# Maps the size of a Block to the size of its children and the offsets of
+# their positions from its own, in the order of Block.children. Every Block
+# of the same size shares these by reference, so that the geometry of a level
+# is only calculated once, and looking it up allocates nothing.
+_GEOMETRY: Dict[int, Tuple[int, Tuple[Tuple[int, int], ...]]] = {}
 
-def generate_board(max_depth: int, size: int) -> Block:
+
+def _geometry(size: int) -> Tuple[int, Tuple[Tuple[int, int], ...]]:
+    """Return the size of the children of a Block of <size>, and the offsets
+    of their positions from the position of the Block.
+    """
+    geometry = _GEOMETRY.get(size)
+    if geometry is None:
+        half = round(size / 2.0)
+        geometry = (half, ((half, 0), (0, 0), (0, half), (half, half)))
+        _GEOMETRY[size] = geometry
+    return geometry
+
+
+def level_sizes(size: int, max_depth: int) -> List[int]:
+    """Return the size of the Blocks at each level, from 0 to <max_depth>, of
+    a board of <size>.
+
+    Sizes are rounded at every level exactly as Block does, so they need not
+    be a power of two.
+
+    >>> level_sizes(750, 5)
+    [750, 375, 188, 94, 47, 24]
+    """
+    sizes = [size]
+    for _ in range(max_depth):
+        sizes.append(_geometry(sizes[-1])[0])
+    return sizes
+
+
+def generate_board(max_depth: int, size: int,
+                   rng: Optional[random.Random] = None) -> Block:
     """Return a new game board with a depth of <max_depth> and dimensions of
     <size> by <size>.
 
+    The board is generated using <rng> if it is given, or the random module
+    otherwise. Both give the same board when seeded with the same seed.
+
     >>> board = generate_board(3, 750)
     >>> board.max_depth
     3
@@ -41,12 +79,59 @@ def generate_board(max_depth: int, size: int) -> Block:
     >>> len(board.children) == 4
     True
     """
-    board = Block((0, 0), size, random.choice(COLOUR_LIST), 0, max_depth)
-    board.smash()
+    # Work out the geometry of every level before any Block needs it
+    level_sizes(size, max_depth)
+    source = random if rng is None else rng
+    board = Block((0, 0), size, source.choice(COLOUR_LIST), 0, max_depth)
+    board.smash(rng)
 
     return board
 
 
+def get_path(root: Block, target: Block) -> Optional[List[int]]:
+    """Return the indices of the children to follow from <root> to reach
+    <target>, or None if <target> is not a block within <root>.
+
+    The path to <root> itself is the empty list.
+
+    >>> board = Block((0, 0), 750, None, 0, 1)
+    >>> board.children = [Block(pos, 375, COLOUR_LIST[0], 1, 1) for pos in
+    ...                   board._children_positions()]
+    >>> get_path(board, board.children[2])
+    [2]
+    >>> get_path(board, board)
+    []
+    """
+    path = []
+    node = root
+    x, y = target.position
+    while node is not target:
+        if node.level >= target.level or not node.children:
+            return None
+        for i, child in enumerate(node.children):
+            cx, cy = child.position
+            if cx <= x < cx + child.size and cy <= y < cy + child.size:
+                path.append(i)
+                node = child
+                break
+        else:
+            return None
+    return path
+
+
+def get_descendant(root: Block, path: List[int]) -> Block:
+    """Return the Block reached by following the child indices in <path>
+    from <root>.
+
+    Precondition: <path> is a valid path within <root>, e.g. one returned by
+    get_path.
+    """
+    node = root
+    for i in path:
+        node = node.children[i]
+    return node
+
+
 class Block:
     """A square Block in the Blocky game, represented as a tree.
 
@@ -125,20 +210,27 @@ class Block:
         >>> str(block)
         'Leaf: colour=Black, pos=(0, 0), size=750, level=0\\n'
         """
+        lines = []
+        self._str_lines(lines)
+        return ''.join(lines)
+
+    def _str_lines(self, lines: List[str]) -> None:
+        """Append the lines of this Block's string format to <lines>.
+
+        The lines are collected in one list, rather than concatenating the
+        strings of the children, so that large boards take linear time.
+        """
+        indents = '\t' * self.level
         if len(self.children) == 0:
-            indents = '\t' * self.level
             colour = colour_name(self.colour)
-            return f'{indents}Leaf: colour={colour}, pos={self.position}, ' \
-                   f'size={self.size}, level={self.level}\n'
+            lines.append(f'{indents}Leaf: colour={colour}, '
+                         f'pos={self.position}, size={self.size}, '
+                         f'level={self.level}\n')
         else:
-            indents = '\t' * self.level
-            result = f'{indents}Parent: pos={self.position},' \
-                     f'size={self.size}, level={self.level}\n'
-
+            lines.append(f'{indents}Parent: pos={self.position},'
+                         f'size={self.size}, level={self.level}\n')
             for child in self.children:
-                result += str(child)
-
-            return result
+                child._str_lines(lines)
 
     def __eq__(self, other: Block) -> bool:
         """Return True iff this Block and all its descendents are equivalent to
@@ -166,7 +258,7 @@ class Block:
     def _child_size(self) -> int:
         """Return the size of this Block's children.
         """
-        return round(self.size / 2.0)
+        return _geometry(self.size)[0]
 
     def _children_positions(self) -> List[Tuple[int, int]]:
         """Return the positions of this Block's four children.
@@ -174,11 +266,8 @@ class Block:
         The positions are returned in this order: upper-right child, upper-left
         child, lower-left child, lower-right child.
         """
-        x = self.position[0]
-        y = self.position[1]
-        size = self._child_size()
-
-        return [(x + size, y), (x, y), (x, y + size), (x + size, y + size)]
+        x, y = self.position
+        return [(x + dx, y + dy) for dx, dy in _geometry(self.size)[1]]
 
     def _update_children_positions(self, position: Tuple[int, int]) -> None:
         """Set the position of this Block to <position> and update all its
@@ -189,8 +278,18 @@ class Block:
         """
         # -RT -F
         self.position = position
-        for pos, child in zip(self._children_positions(), self.children):
-            child._update_children_positions(pos)
+        if self.children:
+            x, y = position
+            for (dx, dy), child in zip(_geometry(self.size)[1],
+                                       self.children):
+                child._update_children_positions((x + dx, y + dy))
+
+    def update_positions(self) -> None:
+        """Update the positions of all this Block's descendants to be
+        consistent with its own, after their order was changed by
+        swap_children.
+        """
+        self._update_children_positions(self.position)
 
     def smashable(self) -> bool:
         """Return True iff this block can be smashed.
@@ -200,27 +299,32 @@ class Block:
         """
         return self.level != self.max_depth and len(self.children) == 0
 
-    def smash(self) -> bool:
+    def smash(self, rng: Optional[random.Random] = None) -> bool:
         """Sub-divide this block so that it has four randomly generated
         children.
 
         If this Block's level is <max_depth>, do nothing. If this block has
         children, do nothing.
+
+        The children are generated using <rng> if it is given, so that the
+        same smash can be repeated exactly, or the random module otherwise.
         
         Return True iff the smash was performed.
         """
         # -RT -F
         if not self.smashable():
             return False
+        source = random if rng is None else rng
         self.colour = None
-        child_size = self._child_size()
+        child_size, offsets = _geometry(self.size)
         next_level = self.level + 1
+        x, y = self.position
         self.children = [
-            Block(pos, child_size, random.choice(COLOUR_LIST), next_level,
-                  self.max_depth) for pos in self._children_positions()]
+            Block((x + dx, y + dy), child_size, source.choice(COLOUR_LIST),
+                  next_level, self.max_depth) for dx, dy in offsets]
         for child in self.children:
-            if random.random() < math.exp(-0.25 * next_level):
-                child.smash()
+            if source.random() < math.exp(-0.25 * next_level):
+                child.smash(rng)
         return True
 
     def swap(self, direction: int) -> bool:
@@ -236,12 +340,24 @@ class Block:
         # -RT -F
         if not self.children:
             return False
+        self.swap_children(direction)
+        self._update_children_positions(self.position)
+        return True
+
+    def swap_children(self, direction: int) -> None:
+        """Reorder the children of this Block as swap does, without updating
+        their positions.
+
+        This is faster than swap when many moves are made in a row, for
+        example when a game is replayed, and update_positions is called once
+        they are done.
+
+        Precondition: this Block has children and <direction> is 0 or 1
+        """
         offset = 2 * direction
         c = self.children
         c[0], c[1 + offset] = c[1 + offset], c[0]
         c[2], c[3 - offset] = c[3 - offset], c[2]
-        self._update_children_positions(self.position)
-        return True
 
     def rotate(self, direction: int) -> bool:
         """Rotate this Block and all its descendants.
@@ -256,12 +372,22 @@ class Block:
         # -RT -F
         if not self.children:
             return False
-        self.children = [self.children[(i + direction) % 4] for i in range(4)]
+        self._rotate_children(direction)
+        # Positions are only updated once, after every level has been rotated
         self._update_children_positions(self.position)
-        for child in self.children:
-            child.rotate(direction)
         return True
 
+    def _rotate_children(self, direction: int) -> None:
+        """Reorder the children of this Block and all its descendants as
+        rotate does, without updating their positions.
+        """
+        c = self.children
+        self.children = [c[direction % 4], c[(1 + direction) % 4],
+                         c[(2 + direction) % 4], c[(3 + direction) % 4]]
+        for child in self.children:
+            if child.children:
+                child._rotate_children(direction)
+
     def paint(self, colour: Tuple[int, int, int]) -> bool:
         """Change this Block's colour iff it is a leaf at a level of max_depth
         and its colour is different from <colour>.
@@ -289,18 +415,51 @@ class Block:
         Return True iff this Block was turned into a leaf node.
         """
         # -RT -F
-        if not self.level == self.max_depth - 1 or not self.children:
+        if self.level != self.max_depth - 1 or not self.children:
             return False
-        colours = [c.colour for c in self.children]
-        maj = [c for c in COLOUR_LIST if colours.count(c) >= 2]
-        # This happens when two colours tie
-        if len(maj) != 1:
+        colour = self.majority_colour()
+        if colour is None:
             return False
 
+        self.colour = colour
         self.children.clear()
-        self.colour = maj[0]
         return True
 
+    def combinable(self) -> bool:
+        """Return True iff this block can be combined.
+
+        A block can be combined if it is at a level of max_depth - 1, it has
+        children, and there is a majority colour among its children.
+        """
+        return self.level == self.max_depth - 1 and len(self.children) != 0 \
+            and self.majority_colour() is not None
+
+    def majority_colour(self) -> Optional[Tuple[int, int, int]]:
+        """Return the colour shared by the most children of this Block, or
+        None if there is no such colour (including when two colours tie).
+
+        A colour shared by only one child is not a majority. The children are
+        counted in a single pass over a histogram of their colours, so any
+        number of colours can be used, not just those in COLOUR_LIST.
+        """
+        counts = {}
+        majority = None
+        most = 0
+        tie = False
+        for child in self.children:
+            colour = child.colour
+            if colour is None:
+                continue
+            count = counts.get(colour, 0) + 1
+            counts[colour] = count
+            if count > most:
+                majority, most, tie = colour, count, False
+            elif count == most:
+                tie = True
+        if tie or most < 2:
+            return None
+        return majority
+
     def create_copy(self) -> Block:
         """Return a new Block that is a deep copy of this Block.
 
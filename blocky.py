@@ -24,14 +24,19 @@ This file contains the different game states for the Blocky game.
 
 from __future__ import annotations
 from typing import Dict, List, Optional, Tuple
+import threading
+import time
 import pygame
 
-from actions import ACTION_MESSAGE, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,\
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
-from block import Block
-from player import Player
+from actions import ACTION_MESSAGE
+from block import Block, get_path
+from controls import UNDO_KEY, REDO_KEY, STATS_KEY
+from game_data import GameData
+from history import History
+from player import Player, HumanPlayer, RandomPlayer
 from renderer import Renderer
 from settings import ANIMATION_DURATION
+from telemetry import turn_record
 
 
 
@@ -59,67 +64,131 @@ def _block_to_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
     return lst
 
 
-class GameData:
+class SquareCache:
+    """The squares to draw for a board, as returned by _block_to_squares,
+    kept between frames.
+
+    The squares of every Block with children are cached. After a move, only
+    the Block that was moved and its ancestors need to be rebuilt, using the
+    cached squares of their other children. Cached lists are never changed
+    once built, so it is safe to hold on to a list returned by squares.
     """
-    A bundle of the data needed for a Blocky game.
-
-    === Public Attributes ===
-    max_turns:
-        The maximum number of turns for the game.
-    board:
-        The Blocky board on which this game will be played.
-    players:
-        The entities that are playing this game.
-    smashes:
-        The number of smashes done by each player.
-    combines:
-        The number of combines done by each player.
-    paints:
-        The number of paints done by each player.
-
-    === Representation Invariants ===
-    - len(players) >= 1
+    # === Private Attributes ===
+    # _board:
+    #   The board the cached squares belong to.
+    # _cache:
+    #   Maps the path to a Block with children to the squares of that Block.
+    _board: Optional[Block]
+    _cache: Dict[Tuple[int, ...], List[Tuple[Tuple[int, int, int],
+                                             Tuple[int, int], int]]]
+
+    def __init__(self) -> None:
+        """Initialize an empty cache.
+        """
+        self._board = None
+        self._cache = {}
+
+    def squares(self, board: Block) -> List[Tuple[Tuple[int, int, int],
+                                                  Tuple[int, int], int]]:
+        """Return the squares to draw for <board>, as _block_to_squares does.
+
+        If nothing has been invalidated since the last call with <board>, the
+        same list is returned without visiting the board at all.
+        """
+        if board is not self._board:
+            self._board = board
+            self._cache = {}
+        return self._build(board, ())
+
+    def invalidate(self, path: Optional[List[int]] = None) -> None:
+        """Forget the squares of the Block at <path> from the board, which
+        has changed, along with those of its ancestors and descendants.
+
+        If <path> is None, forget every square.
+        """
+        if path is None:
+            self._cache = {}
+            return
+        key = tuple(path)
+        for i in range(len(key) + 1):
+            self._cache.pop(key[:i], None)
+        stale = [k for k in self._cache if k[:len(key)] == key]
+        for k in stale:
+            del self._cache[k]
+
+    def _build(self, block: Block, path: Tuple[int, ...]) \
+            -> List[Tuple[Tuple[int, int, int], Tuple[int, int], int]]:
+        """Return the squares of <block>, whose path from the board is
+        <path>, building and caching them if they are not cached.
+        """
+        if not block.children:
+            return [(block.colour, block.position, block.size)]
+        if path not in self._cache:
+            squares = []
+            for i, child in enumerate(block.children):
+                squares.extend(self._build(child, path + (i,)))
+            self._cache[path] = squares
+        return self._cache[path]
+
+
+def _print_instrumentation() -> None:
+    """Print the measurements of the instrumented operations, if
+    instrumentation is enabled.
     """
-    max_turns: int
-    board: Block
-    players: List[Player]
-    smashes: Dict[int, int]
-    combines: Dict[int, int]
-    paints: Dict[int, int]
-
-    def __init__(self, board: Block, players: List[Player]) -> None:
-        """Initialize the game data, saving a reference to <board> and
-        <players>.
-
-        Precondition:
-            - len(players) >= 1
+    # Imported here since instrument.py instruments this module
+    import instrument
+
+    if instrument.is_enabled():
+        print(instrument.report())
+
+
+class _MoveWorker:
+    """Generates the move of a computer player on a background thread, so that
+    the game can still be drawn while the player decides on its move.
+    """
+    # === Private Attributes ===
+    # _thread:
+    #   The thread generating the move.
+    # _move:
+    #   The move that was generated, or None if there is none yet.
+    # _seconds:
+    #   The time taken to generate the move.
+    _thread: threading.Thread
+    _move: Optional[Tuple[str, Optional[int], Block]]
+    _seconds: float
+
+    def __init__(self, player: Player, board: Block) -> None:
+        """Start generating the move of <player> on <board>.
         """
-        self.max_turns = 0
-        self.board = board
-        self.players = players
-
-        self.smashes = {}
-        self.combines = {}
-        self.paints = {}
-
-        # Start off all counts at 0
-        for player in players:
-            self.smashes[player.id] = 0
-            self.combines[player.id] = 0
-            self.paints[player.id] = 0
-
-    def calculate_score(self, player_id: int) -> Tuple[int, int]:
-        """Return a tuple containing first the <player_id>'s score based on
-        their goal in the game and second the deductions from their score based
-        on the actions they've taken.
+        self._move = None
+        self._seconds = 0.0
+        self._thread = threading.Thread(target=self._generate,
+                                        args=(player, board), daemon=True)
+        self._thread.start()
+
+    def _generate(self, player: Player, board: Block) -> None:
+        start = time.perf_counter()
+        self._move = player.generate_move(board)
+        self._seconds = time.perf_counter() - start
+
+    def done(self) -> bool:
+        """Return True iff the move has been generated.
         """
-        goal_score = self.players[player_id].goal.score(self.board)
+        return not self._thread.is_alive()
 
-        penalty = self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
-                  self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
-                  self.paints[player_id] * ACTION_PENALTY[PAINT]
+    def move(self) -> Optional[Tuple[str, Optional[int], Block]]:
+        """Return the move that was generated.
 
-        return goal_score, penalty
+        Precondition: self.done()
+        """
+        return self._move
+
+    def seconds(self) -> float:
+        """Return the time taken to generate the move.
+
+        Precondition: self.done()
+        """
+        return self._seconds
 
 
 class GameState:
@@ -143,6 +212,17 @@ class GameState:
         """
         raise NotImplementedError
 
+    def is_animating(self) -> bool:
+        """Return True iff this GameState changes over time by itself, and so
+        must be updated and rendered even when there are no events.
+        """
+        return False
+
+    def needs_redraw(self, event: pygame.event.Event) -> bool:
+        """Return True iff <event> may change what this GameState renders.
+        """
+        return True
+
 
 class MainState(GameState):
     """A GameState that manages the moves made by different players in Blocky.
@@ -156,17 +236,43 @@ class MainState(GameState):
     #   The index of the current player in GameData.players.
     # _current_score:
     #   The score of the current player, including penalties.
+    # _history:
+    #   The moves made so far, which human players can undo and redo.
+    # _squares:
+    #   The squares to draw for the board, kept between frames.
+    # _worker:
+    #   The worker generating the move of the current player, if it is a
+    #   computer player that is deciding on its move.
+    # _background_moves:
+    #   Whether computer players generate their moves on a _MoveWorker, or
+    #   on the calling thread, which stops drawing until the move is made.
+    # _shown_selection:
+    #   The block that was highlighted when this GameState was last rendered.
     _turn: int
     _data: GameData
     _current_player_index: int
     _current_score: int
+    _history: History
+    _squares: SquareCache
+    _worker: Optional[_MoveWorker]
+    _background_moves: bool
+    _shown_selection: Optional[Block]
 
-    def __init__(self, data: GameData) -> None:
+    def __init__(self, data: GameData, background_moves: bool = True) -> None:
         """Initialize this GameState.
+
+        If <background_moves> is False, computer players generate their moves
+        on the thread that updates this GameState, so that a profiler enabled
+        on that thread sees them.
         """
         self._turn = 0
         self._data = data
         self._current_player_index = 0
+        self._history = History(data)
+        self._squares = SquareCache()
+        self._worker = None
+        self._background_moves = background_moves
+        self._shown_selection = None
 
         score, penalty = self._data.calculate_score(self._current_player().id)
         self._current_score = score - penalty
@@ -188,68 +294,137 @@ class MainState(GameState):
         if self._current_player_index == 0:
             self._turn += 1
 
-    def _do_move(self, move: Tuple[str, Optional[int], Block]) -> bool:
-        """Attempt to do the player's requested move.
+    def _do_move(self, move: Tuple[str, Optional[int], Block],
+                 generate_seconds: float) -> bool:
+        """Attempt to do the player's requested move, which took
+        <generate_seconds> to generate.
+
+        If the game has telemetry, the player's score after the move is
+        calculated once, timed, and emitted with the move.
         """
-        action = (move[0], move[1])
-        direction = move[1]
-        block = move[2]
         player = self._current_player()
-        move_successful = False
-
-        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
-            move_successful = block.rotate(direction)
-        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
-            move_successful = block.swap(direction)
-        elif action == SMASH:
-            move_successful = block.smash()
-            self._data.smashes[player.id] += int(move_successful)
-        elif action == PAINT:
-            move_successful = block.paint(self._current_player().goal.colour)
-            self._data.paints[player.id] += int(move_successful)
-        elif action == COMBINE:
-            move_successful = block.combine()
-            self._data.combines[player.id] += int(move_successful)
-        elif action == PASS:
-            # Do nothing
-            move_successful = True
+        turn = self._turn
+        path = get_path(self._data.board, move[2])
+        move_successful = self._history.do_move(
+            player, move, turn, self._current_player_index)
+
+        if self._data.telemetry is not None:
+            start = time.perf_counter()
+            score = self._data.calculate_score(player.id)
+            score_seconds = time.perf_counter() - start
+            self._data.telemetry.emit(turn_record(
+                player, move, turn, move_successful, generate_seconds, score,
+                score_seconds))
 
         if move_successful:
+            self._squares.invalidate(path)
             self._update_player()
 
         return move_successful
 
+    def _human_indices(self) -> List[int]:
+        """Return the indices in GameData.players of the human players.
+        """
+        return [i for i, p in enumerate(self._data.players)
+                if isinstance(p, HumanPlayer)]
+
+    def _undo(self) -> None:
+        """Undo the last move made by a person, along with every move that
+        computer players made after it, and give the turn back to the person
+        who made it.
+
+        Nothing is undone if no person has made a move that can be undone.
+        """
+        for _ in range(self._history.undo_count(self._human_indices())):
+            self._turn, self._current_player_index, path = \
+                self._history.undo()
+            self._squares.invalidate(path)
+        score, penalty = self._data.calculate_score(self._current_player().id)
+        self._current_score = score - penalty
+
+    def _redo(self) -> None:
+        """Redo the last move that was undone, along with every move that
+        computer players made after it, and pass the turn on to the player
+        after them.
+        """
+        for _ in range(self._history.redo_count(self._human_indices())):
+            self._turn, self._current_player_index, path = \
+                self._history.redo()
+            self._squares.invalidate(path)
+            self._update_player()
+
     def process_event(self, event: pygame.event.Event) -> None:
+        if event.type == pygame.KEYDOWN and event.key == STATS_KEY:
+            _print_instrumentation()
+        # Only a person can ask to undo or redo a move
+        if event.type == pygame.KEYDOWN and \
+                isinstance(self._current_player(), HumanPlayer):
+            if event.key == UNDO_KEY:
+                self._undo()
+                return
+            elif event.key == REDO_KEY:
+                self._redo()
+                return
         self._current_player().process_event(event)
 
     def update(self) -> GameState:
         if self._turn >= self._data.max_turns:
             return GameOverState(self._data)
 
-        # Ask the player to make a move
-        move = self._current_player().generate_move(self._data.board)
+        # Ask the player to make a move. Computer players may take a while,
+        # so their moves are generated in the background while the game keeps
+        # being drawn, unless background moves are turned off.
+        player = self._current_player()
+        if not isinstance(player, RandomPlayer) or \
+                (not self._background_moves and player.ready()):
+            start = time.perf_counter()
+            move = player.generate_move(self._data.board)
+            generate_seconds = time.perf_counter() - start
+        elif self._worker is None:
+            if player.ready():
+                self._worker = _MoveWorker(player, self._data.board)
+            return self
+        elif self._worker.done():
+            move = self._worker.move()
+            generate_seconds = self._worker.seconds()
+            self._worker = None
+        else:
+            return self
 
         if move is None:
             # No move was made, stay in the current state
             return self
         else:
             # Save what the board looks like before the move
-            background = _block_to_squares(self._data.board)
+            background = self._squares.squares(self._data.board)
             # Also save the current player ID
             player_id = self._current_player().id
 
             # Do the move
-            if self._do_move(move):
+            move_successful = self._do_move(move, generate_seconds)
+            if move_successful:
                 # Animate the move that was just done
                 return AnimateMoveState(self, player_id, move, background)
             else:
                 # The move was not valid, let the player try again
                 return self
 
+    def is_animating(self) -> bool:
+        # Keep checking whether the computer player has decided on its move
+        return self._worker is not None
+
+    def needs_redraw(self, event: pygame.event.Event) -> bool:
+        # Moving the mouse only matters if it highlights a different block
+        if event.type == pygame.MOUSEMOTION:
+            return self._current_player().get_selected_block(
+                self._data.board) is not self._shown_selection
+        return True
+
     def render(self, renderer: Renderer) -> None:
-        renderer.draw_board(_block_to_squares(self._data.board))
+        renderer.draw_board(self._squares.squares(self._data.board))
 
         b = self._current_player().get_selected_block(self._data.board)
+        self._shown_selection = b
         if b is not None:
             renderer.highlight_block(b.position, b.size)
 
@@ -295,6 +470,12 @@ class AnimateMoveState(GameState):
     def process_event(self, event: pygame.event.Event) -> None:
         return  # Ignore the event
 
+    def is_animating(self) -> bool:
+        return True
+
+    def needs_redraw(self, event: pygame.event.Event) -> bool:
+        return False
+
     def update(self) -> GameState:
         elapsed_seconds = (pygame.time.get_ticks() - self._start_time) / 1000
 
@@ -342,6 +523,7 @@ class GameOverState(GameState):
             self._scores.append((p.id, goal_score, penalty))
 
         self._winner = max(self._scores, key=lambda item: item[1] - item[2])[0]
+        _print_instrumentation()
 
     def process_event(self, event: pygame.event.Event) -> None:
         # Simply ignore the event
@@ -352,6 +534,7 @@ class GameOverState(GameState):
         return self
 
     def render(self, renderer: Renderer) -> None:
+        renderer.clear()
         x = 10
         y = 10
         for t in self._scores:
@@ -373,7 +556,9 @@ if __name__ == '__main__':
         'allowed-io': ['run_game'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'pygame', '__future__',
-            'block', 'player', 'renderer', 'settings', 'actions'
+            'block', 'player', 'renderer', 'settings', 'actions', 'game_data',
+            'controls', 'history', 'threading', 'instrument', 'time',
+            'telemetry'
         ],
         'generated-members': 'pygame.*'
     })
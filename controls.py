@@ -0,0 +1,49 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the keys that human players press to make each action.
+"""
+import pygame
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, COMBINE, PAINT, PASS
+
+ACTION_KEY = {
+    ROTATE_CLOCKWISE: pygame.K_d,
+    ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
+    SWAP_HORIZONTAL: pygame.K_q,
+    SWAP_VERTICAL: pygame.K_e,
+    SMASH: pygame.K_SPACE,
+    COMBINE: pygame.K_c,
+    PAINT: pygame.K_r,
+    PASS: pygame.K_TAB
+}
+
+# Create a dictionary that is ACTION_KEY inverted
+KEY_ACTION = {value: key for key, value in ACTION_KEY.items()}
+
+# The keys human players press to undo and redo moves
+UNDO_KEY = pygame.K_z
+REDO_KEY = pygame.K_y
+
+# The key that prints the measurements of the instrumented operations, when
+# instrumentation is enabled (see instrument.py)
+STATS_KEY = pygame.K_i
@@ -0,0 +1,158 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains an on-disk format for large collections of boards of the
+same max_depth, which can be scored without creating any Block objects.
+
+A corpus file holds a fixed-size header followed by the flattened grid of
+every board, one after another. Each grid is 2^max_depth by 2^max_depth bytes
+of colour indices, laid out as in batch.py. Since every grid has the same
+size, the file is read with mmap and viewed as a single NumPy array of shape
+(N, S, S) without copying, and goals are scored over it a chunk at a time.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import mmap
+import random
+import struct
+
+import numpy as np
+
+from batch import flatten_indices, score_grids
+from block import Block, generate_board
+from goal import Goal
+from settings import BOARD_SIZE
+
+_MAGIC = b'BLKC'
+_VERSION = 1
+# Magic, version, max_depth, number of boards, padded to 32 bytes
+_HEADER = struct.Struct('>4sBBQ18x')
+
+
+def write_corpus(path: str, boards: Iterable[Block], max_depth: int) -> int:
+    """Write the flattened grids of <boards> to a new corpus file at <path>,
+    one board at a time, and return the number of boards written.
+
+    Precondition: every board in <boards> is at level 0 and has <max_depth>
+    """
+    side = 2 ** max_depth
+    grid = np.empty((side, side), dtype=np.uint8)
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, max_depth, 0))
+        for board in boards:
+            f.write(flatten_indices(board, grid).tobytes())
+            count += 1
+        # Now that the number of boards is known, fill it in
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, _VERSION, max_depth, count))
+    return count
+
+
+def generate_corpus(path: str, count: int, max_depth: int,
+                    seed: Optional[int] = None) -> int:
+    """Write a corpus of <count> randomly generated boards with <max_depth>
+    to <path>, and return <count>.
+
+    If <seed> is not None, the boards are generated after seeding the random
+    module with it.
+    """
+    if seed is not None:
+        random.seed(seed)
+    boards = (generate_board(max_depth, BOARD_SIZE) for _ in range(count))
+    return write_corpus(path, boards, max_depth)
+
+
+class Corpus:
+    """A read-only corpus file of flattened boards, mapped into memory.
+
+    === Public Attributes ===
+    max_depth:
+        The max_depth of every board in the corpus.
+    grids:
+        An array of shape (N, S, S) of the colour indices of the unit cells of
+        each of the N boards, which views the file's memory directly.
+    """
+    # === Private Attributes ===
+    # _map:
+    #   The memory map of the corpus file.
+    max_depth: int
+    grids: np.ndarray
+    _map: mmap.mmap
+
+    def __init__(self, path: str) -> None:
+        """Open the corpus file at <path>.
+        """
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, max_depth, count = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or version != _VERSION:
+            self._map.close()
+            raise ValueError(f'{path} is not a Blocky corpus file')
+
+        self.max_depth = max_depth
+        side = 2 ** max_depth
+        self.grids = np.frombuffer(self._map, dtype=np.uint8,
+                                   count=count * side * side,
+                                   offset=_HEADER.size).reshape(count, side,
+                                                                side)
+
+    def __len__(self) -> int:
+        """Return the number of boards in this corpus.
+        """
+        return self.grids.shape[0]
+
+    def __enter__(self) -> Corpus:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the corpus file.
+
+        Precondition: no views of self.grids are still in use.
+        """
+        del self.grids
+        self._map.close()
+
+    def scores(self, goal: Goal, chunk_size: int = 4096) -> np.ndarray:
+        """Return the score of <goal> on every board in this corpus.
+
+        The boards are scored <chunk_size> at a time, so that only one chunk
+        needs to be in memory at once.
+        """
+        result = np.empty(len(self), dtype=np.int64)
+        for start in range(0, len(self), chunk_size):
+            chunk = self.grids[start:start + chunk_size]
+            result[start:start + len(chunk)] = score_grids(goal, chunk)
+        return result
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'mmap',
+            'struct', 'numpy', 'batch', 'block', 'goal', 'settings'
+        ]
+    })
@@ -24,16 +24,44 @@ Please use this as a starting point to check your work and write your own
 tests!
 """
 from typing import List, Optional, Tuple
+import io
+import json
 import os
+import random
+import subprocess
+import sys
+import threading
+import numpy as np
 import pygame
 import pytest
 
-from block import Block
-from blocky import _block_to_squares
-from goal import BlobGoal, PerimeterGoal, _flatten
-from player import _get_block
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SMASH, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL
+from batch import score_boards
+from benchmark import compare, run_benchmarks, run_memory_benchmarks, \
+    run_turn_benchmarks
+from block import Block, generate_board, get_descendant, get_path, \
+    level_sizes
+from corpus import Corpus, write_corpus
+from export import FrameSink, export_game, read_frames
+from game import main as game_main
+from game_data import GameData
+from history import History
+import instrument
+from controls import REDO_KEY, UNDO_KEY
+from blocky import AnimateMoveState, MainState, SquareCache, \
+    _block_to_squares
+from goal import BlobGoal, Goal, PerimeterGoal, _flatten
+from player import _estimate, _get_block, _legal_moves, _perform, \
+    AdversarialPlayer, HumanPlayer, RandomPlayer, SmartPlayer
+from raster import PixelRenderer, rasterise
 from renderer import Renderer
-from settings import COLOUR_LIST
+from serialize import decode_board, encode_board
+from settings import COLOUR_LIST, OUTLINE_COLOUR, OUTLINE_THICKNESS
+from replay import MoveLog, Replay
+from simulator import create_simulator
+from telemetry import RingBufferSink, Telemetry
+from tournament import run_tournament, summarise
 
 
 def set_children(block: Block, colours: List[Optional[Tuple[int, int, int]]]) \
@@ -55,10 +83,25 @@ def set_children(block: Block, colours: List[Optional[Tuple[int, int, int]]]) \
         block.children.append(b)
 
 
+def _random_block(board: Block) -> Block:
+    """Return a randomly chosen descendant of <board>.
+    """
+    block = board
+    while block.children and random.random() < 0.7:
+        block = random.choice(block.children)
+    return block
+
+
 @pytest.fixture
-def renderer() -> Renderer:
+def pygame_display() -> None:
+    """Set up pygame to draw without opening a window.
+    """
     os.environ['SDL_VIDEODRIVER'] = 'dummy'
     pygame.init()
+
+
+@pytest.fixture
+def renderer(pygame_display) -> Renderer:
     return Renderer(750)
 
 
@@ -164,6 +207,28 @@ def test_block_to_squares_reference(board_16x16) -> None:
     assert squares == expected
 
 
+def test_square_cache_follows_moves(board_16x16) -> None:
+    """Test that the cached squares of a board only change when part of the
+    board is invalidated, and then match _block_to_squares again.
+    """
+    cache = SquareCache()
+    squares = cache.squares(board_16x16)
+    assert set(squares) == set(_block_to_squares(board_16x16))
+    assert cache.squares(board_16x16) is squares
+
+    board_16x16.children[1].rotate(1)
+    cache.invalidate([1])
+    assert set(cache.squares(board_16x16)) == \
+        set(_block_to_squares(board_16x16))
+
+    board_16x16.children[0].smash()
+    cache.invalidate([0])
+    assert set(cache.squares(board_16x16)) == \
+        set(_block_to_squares(board_16x16))
+    # The list returned before the moves is left as it was
+    assert len(squares) == 7
+
+
 class TestRender:
     """A collection of methods that show you a way to save the boards in your
     test cases to image (i.e., PNG) files.
@@ -205,6 +270,81 @@ class TestRender:
         renderer.draw_board(_block_to_squares(board_16x16))
         renderer.save_to_file('your-rotate-1.png')
 
+    def test_redrawing_changed_squares(self, renderer) -> None:
+        """Test that drawing a board after a few moves only redraws what
+        changed, but leaves the screen the same as drawing it from scratch.
+        """
+        random.seed(3)
+        board = generate_board(4, 750)
+        renderer.draw_board(_block_to_squares(board))
+        renderer.highlight_block(board.children[0].position,
+                                 board.children[0].size)
+        for _ in range(5):
+            block = _random_block(board)
+            if block.children:
+                block.rotate(1)
+            else:
+                block.paint(COLOUR_LIST[(COLOUR_LIST.index(block.colour) + 1)
+                                        % len(COLOUR_LIST)])
+            renderer.draw_board(_block_to_squares(board))
+
+        expected = pygame.Surface((750, 750))
+        for colour, pos, size in _block_to_squares(board):
+            pygame.draw.rect(expected, colour, (pos, (size, size)), 0)
+            pygame.draw.rect(expected, OUTLINE_COLOUR, (pos, (size, size)),
+                             OUTLINE_THICKNESS)
+        screen = pygame.display.get_surface().subsurface((0, 0, 750, 750))
+        assert pygame.image.tobytes(screen, 'RGB') == \
+            pygame.image.tobytes(expected, 'RGB')
+
+    def test_images_are_scaled_ahead_of_time(self, pygame_display) -> None:
+        """Test that drawing an action on a Block of any level uses an image
+        that was already scaled.
+        """
+        renderer = Renderer(750, 3)
+        scaled = dict(renderer._scaled_images)
+        block = generate_board(3, 750)
+        while block.children:
+            block = block.children[0]
+            renderer.draw_image(SMASH, block.position, block.size)
+        assert renderer._scaled_images == scaled
+
+    def test_rasterise_matches_draw_board(self) -> None:
+        """Test that rasterising a board gives the same pixels as drawing it
+        with pygame.
+        """
+        random.seed(5)
+        board = generate_board(5, 750)
+        expected = pygame.Surface((750, 750))
+        for colour, pos, size in _block_to_squares(board):
+            pygame.draw.rect(expected, colour, (pos, (size, size)), 0)
+            pygame.draw.rect(expected, OUTLINE_COLOUR, (pos, (size, size)),
+                             OUTLINE_THICKNESS)
+
+        pixels = rasterise(board)
+        assert pixels.tobytes() == pygame.image.tobytes(expected, 'RGB')
+
+        renderer = PixelRenderer(750)
+        renderer.draw_board(_block_to_squares(board))
+        surface = renderer.to_surface()
+        assert pygame.image.tobytes(surface, 'RGB') == pixels.tobytes()
+
+    def test_text_and_images_are_not_redrawn(self, pygame_display) -> None:
+        """Test that an unchanged status message is not drawn again, and that
+        lazily loaded images are only loaded when they are drawn.
+        """
+        renderer = Renderer(750, lazy_images=True)
+        assert renderer._images == {}
+        renderer.draw_image(SMASH, (0, 0), 375)
+        assert list(renderer._images) == [SMASH]
+
+        renderer.present()
+        renderer.draw_status('Turn 0')
+        assert len(renderer._dirty) == 1
+        renderer.present()
+        renderer.draw_status('Turn 0')
+        assert renderer._dirty == []
+
 
 class TestBlock:
     """A collection of methods that test the Block class.
@@ -257,6 +397,65 @@ class TestBlock:
         board_16x16.children[0].rotate(1)
         assert board_16x16 == board_16x16_rotate1
 
+    def test_encode_round_trip(self, board_16x16) -> None:
+        """Test that encoding a board and decoding it gives back an equal
+        board, for both the reference board and deep random boards.
+        """
+        random.seed(148)
+        boards = [board_16x16, board_16x16.children[0]] + \
+            [generate_board(8, 750) for _ in range(5)]
+
+        for board in boards:
+            assert decode_board(encode_board(board)) == board
+
+    def test_path_round_trip(self, board_16x16) -> None:
+        """Test that the path to a block leads back to that same block.
+        """
+        block = board_16x16.children[0].children[3]
+        path = get_path(board_16x16, block)
+
+        assert path == [0, 3]
+        assert get_descendant(board_16x16, path) is block
+        assert get_path(board_16x16.children[1], block) is None
+
+    def test_geometry_of_non_power_of_two_boards(self) -> None:
+        """Test that every Block of a board whose size is not a power of two
+        has the size of its level, and that swaps and rotates keep each child
+        where the geometry of its parent puts it.
+        """
+        random.seed(750)
+        board = generate_board(5, 750)
+        board.rotate(1)
+        board.swap(0)
+        board.children[2].rotate(3)
+        sizes = level_sizes(750, 5)
+
+        stack = [board]
+        while stack:
+            block = stack.pop()
+            assert block.size == sizes[block.level]
+            if block.children:
+                positions = [child.position for child in block.children]
+                assert positions == block._children_positions()
+                stack.extend(block.children)
+
+    def test_combine_with_a_larger_palette(self) -> None:
+        """Test that combine finds the majority colour among colours that are
+        not in COLOUR_LIST, and that a tie is not a majority.
+        """
+        palette = [(i, 255 - i, 128) for i in range(0, 250, 10)]
+        block = Block((0, 0), 750, None, 0, 1)
+        positions = block._children_positions()
+        for colours, majority in [([0, 5, 5, 24], 5), ([3, 9, 9, 3], None),
+                                  ([1, 2, 3, 4], None), ([7, 7, 7, 0], 7)]:
+            block.colour = None
+            block.children = [Block(pos, 375, palette[c], 1, 1)
+                              for pos, c in zip(positions, colours)]
+            assert block.combine() == (majority is not None)
+            if majority is not None:
+                assert block.colour == palette[majority]
+                assert block.children == []
+
 
 class TestPlayer:
     """A collection of methods for testing the methods and functions in the
@@ -283,6 +482,86 @@ class TestPlayer:
         assert _get_block(board_16x16, top_right, 2) == \
             board_16x16.children[0].children[0]
 
+    def test_adversarial_player_improves_score(self, board_16x16) -> None:
+        """Test that an AdversarialPlayer finds a move that improves its score
+        without mutating the board.
+        """
+        goal = PerimeterGoal(COLOUR_LIST[1])
+        opponent = AdversarialPlayer(1, BlobGoal(COLOUR_LIST[0]))
+        player = AdversarialPlayer(0, goal, depth=2)
+        player.observe_players([player, opponent])
+        player._proceed = True
+        copy = board_16x16.create_copy()
+
+        action, direction, block = player.generate_move(board_16x16)
+
+        assert board_16x16 == copy
+        assert get_path(board_16x16, block) is not None
+        assert (action, direction) != ('pass', None)
+
+        _perform(block, (action, direction), goal.colour)
+        assert goal.score(board_16x16) > goal.score(copy)
+
+    def test_estimate_rotates_and_swaps(self, board_16x16) -> None:
+        """Test that the estimate of a rotate or swap, which moves order the
+        search, is the change it makes to a PerimeterGoal's score.
+        """
+        goal = PerimeterGoal(COLOUR_LIST[3])
+        grid = _flatten(board_16x16)
+        moved = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
+                 SWAP_VERTICAL]
+        moves = [(a, p) for a, p in _legal_moves(board_16x16, goal.colour)
+                 if a in moved]
+        assert moves
+        for action, path in moves:
+            copy = board_16x16.create_copy()
+            _perform(get_descendant(copy, path), action, goal.colour)
+            block = get_descendant(board_16x16, path)
+            assert _estimate(grid, path, block, action, goal.colour, goal) \
+                == goal.score(copy) - goal.score(board_16x16)
+
+    def test_computer_moves_in_background(self, board_16x16) -> None:
+        """Test that the game keeps being drawn while a computer player
+        decides on its move.
+        """
+        player = SmartPlayer(0, BlobGoal(COLOUR_LIST[0]), 50)
+        state = MainState(GameData(board_16x16, [player]))
+        state._data.max_turns = 1
+        assert state.update() is state
+        player.proceed()
+        assert state.update() is state
+
+        squares = _block_to_squares(board_16x16)
+        while isinstance(state, MainState):
+            assert set(_block_to_squares(board_16x16)) == set(squares)
+            state = state.update()
+        assert isinstance(state, AnimateMoveState)
+
+    def test_computer_moves_in_foreground(self, board_16x16) -> None:
+        """Test that a computer player makes its move on the calling thread,
+        in one update, when background moves are turned off.
+        """
+        player = SmartPlayer(0, BlobGoal(COLOUR_LIST[0]), 5)
+        state = MainState(GameData(board_16x16, [player]), False)
+        state._data.max_turns = 1
+        assert state.update() is state
+        player.proceed()
+        assert isinstance(state.update(), AnimateMoveState)
+        assert state._worker is None
+
+    def test_idle_game_is_not_redrawn(self, renderer, board_16x16) -> None:
+        """Test that moving the mouse without changing the selected block does
+        not need the game to be drawn again, but pressing a key does.
+        """
+        state = MainState(GameData(board_16x16, [HumanPlayer(0, BlobGoal(
+            COLOUR_LIST[0]))]))
+        state.render(renderer)
+        motion = pygame.event.Event(pygame.MOUSEMOTION, pos=(0, 0))
+        key = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_s)
+        assert not state.is_animating()
+        assert not state.needs_redraw(motion)
+        assert state.needs_redraw(key)
+
 
 class TestGoal:
     """A collection of methods for testing the sub-classes of Goal.
@@ -328,6 +607,384 @@ class TestGoal:
             goal = PerimeterGoal(colour)
             assert goal.score(board_16x16) == expected
 
+    def test_batch_scores_match_goals(self, board_16x16) -> None:
+        """Test that scoring many boards at once gives the same results as
+        scoring each board with its goal.
+        """
+        random.seed(148)
+        boards = [generate_board(3, 750) for _ in range(20)]
+
+        for colour in COLOUR_LIST:
+            for goal in (PerimeterGoal(colour), BlobGoal(colour)):
+                expected = [goal.score(b) for b in boards]
+                assert score_boards(goal, boards) == expected
+                assert score_boards(goal, [board_16x16]) == \
+                    [goal.score(board_16x16)]
+
+        with pytest.raises(TypeError):
+            score_boards(Goal(COLOUR_LIST[0]), boards)
+
+    def test_corpus_scores_match_goals(self, tmp_path) -> None:
+        """Test that scoring the boards of a corpus file gives the same results
+        as scoring each board with its goal.
+        """
+        random.seed(148)
+        boards = [generate_board(4, 750) for _ in range(30)]
+        path = str(tmp_path / 'boards.blkc')
+
+        assert write_corpus(path, boards, 4) == 30
+        with Corpus(path) as corpus:
+            assert len(corpus) == 30
+            for goal in (PerimeterGoal(COLOUR_LIST[2]),
+                         BlobGoal(COLOUR_LIST[3])):
+                expected = [goal.score(b) for b in boards]
+                assert corpus.scores(goal, chunk_size=7).tolist() == expected
+
+
+class TestHistory:
+    """A collection of methods for testing undoing and redoing moves.
+    """
+    def test_undo_redo_restore(self) -> None:
+        """Test that undoing moves gives back each earlier board and penalty
+        counts, and that redoing and restoring them gives the later ones.
+        """
+        random.seed(148)
+        board = generate_board(4, 750)
+        players = [RandomPlayer(0, PerimeterGoal(COLOUR_LIST[0])),
+                   RandomPlayer(1, BlobGoal(COLOUR_LIST[1]))]
+        data = GameData(board, players)
+        history = History(data, snapshot_interval=4)
+
+        states = [(data.board.create_copy(), dict(data.smashes),
+                   dict(data.paints), dict(data.combines))]
+        for i in range(30):
+            player = players[i % 2]
+            player.proceed()
+            assert history.do_move(player, player.generate_move(data.board),
+                                   i // 2, i % 2)
+            states.append((data.board.create_copy(), dict(data.smashes),
+                           dict(data.paints), dict(data.combines)))
+
+        def state() -> tuple:
+            return data.board, data.smashes, data.paints, data.combines
+
+        for i in reversed(range(30)):
+            assert history.undo()[:2] == (i // 2, i % 2)
+            assert state() == states[i]
+        assert history.undo() is None
+        for i in range(30):
+            history.redo()
+            assert state() == states[i + 1]
+        for i in (3, 25, 0, 17, 30):
+            history.restore(i)
+            assert len(history) == i
+            assert state() == states[i]
+
+    def test_undo_takes_back_computer_moves(self) -> None:
+        """Test that a person's undo in a game against a computer player
+        undoes their own last move and the computer's move after it, and that
+        redo brings both back.
+        """
+        random.seed(33)
+        board = generate_board(3, 750)
+        human = HumanPlayer(0, BlobGoal(COLOUR_LIST[0]))
+        computer = RandomPlayer(1, BlobGoal(COLOUR_LIST[1]))
+        data = GameData(board, [human, computer])
+        data.max_turns = 5
+        state = MainState(data)
+        start = board.create_copy()
+
+        assert state._do_move(('rotate', 1, board), 0.0)
+        computer.proceed()
+        while state.update() is state:
+            pass
+        after = board.create_copy()
+        assert state._current_player() is human
+
+        state.process_event(pygame.event.Event(pygame.KEYDOWN, key=UNDO_KEY))
+        assert board == start
+        assert state._current_player() is human
+        assert len(state._history) == 0
+
+        # There is no earlier move of the person to undo
+        state.process_event(pygame.event.Event(pygame.KEYDOWN, key=UNDO_KEY))
+        assert board == start
+
+        state.process_event(pygame.event.Event(pygame.KEYDOWN, key=REDO_KEY))
+        assert board == after
+        assert state._current_player() is human
+        assert len(state._history) == 2
+
+    def test_scores_are_cached_until_the_board_changes(self) -> None:
+        """Test that a player's goal score is only calculated again after a
+        move, undo or redo changes the board, and is then up to date.
+        """
+        class CountingGoal(BlobGoal):
+            calls = 0
+
+            def score(self, board: Block) -> int:
+                CountingGoal.calls += 1
+                return super().score(board)
+
+        random.seed(7)
+        board = Block((0, 0), 750, COLOUR_LIST[1], 0, 2)
+        player = RandomPlayer(0, CountingGoal(COLOUR_LIST[0]))
+        data = GameData(board, [player])
+        history = History(data)
+
+        before = data.calculate_score(0)
+        assert data.calculate_score(0) == before
+        assert CountingGoal.calls == 1
+
+        assert history.do_move(player, (SMASH[0], SMASH[1], board), 0, 0)
+        after = data.calculate_score(0)
+        assert after[0] == BlobGoal(COLOUR_LIST[0]).score(board)
+        assert after[1] > before[1]
+        assert data.calculate_score(0) == after
+        assert CountingGoal.calls == 2
+
+        history.undo()
+        assert data.calculate_score(0) == before
+        history.redo()
+        assert data.calculate_score(0) == after
+        assert CountingGoal.calls == 4
+
+
+class TestSimulator:
+    """A collection of methods for testing games played without a screen.
+    """
+    def test_game_is_played_to_the_end(self) -> None:
+        """Test that a game between computer players ends after the requested
+        number of turns, and that the same seed gives the same game.
+        """
+        sim = create_simulator(3, 1, [5], 4, seed=148)
+        scores = sim.run()
+
+        assert sim.is_over()
+        assert sim.current_turn() == 4
+        assert [s[0] for s in scores] == [0, 1]
+        assert create_simulator(3, 1, [5], 4, seed=148).run() == scores
+
+    def test_simulator_does_not_import_pygame(self) -> None:
+        """Test that games can be simulated without importing pygame.
+        """
+        code = 'import sys, simulator; sys.exit("pygame" in sys.modules)'
+        here = os.path.dirname(os.path.abspath(__file__))
+        assert subprocess.run([sys.executable, '-c', code], cwd=here).\
+            returncode == 0
+
+    def test_replay_rebuilds_every_move(self) -> None:
+        """Test that replaying the log of a game rebuilds the board after
+        every move, including after smashes.
+        """
+        sim = create_simulator(4, 1, [5], 10, seed=148, record=True)
+        boards = [sim.data.board.create_copy()]
+        while not sim.is_over():
+            if sim.step() is not None:
+                boards.append(sim.data.board.create_copy())
+
+        log = MoveLog.from_bytes(sim.data.log.to_bytes())
+        replay = Replay(log, snapshot_interval=3)
+
+        assert len(replay) == len(boards) - 1 == 20
+        for i in reversed(range(len(boards))):
+            assert replay.board_after(i) == boards[i]
+        assert Replay(log).board_after(20) == boards[-1]
+
+        # A move that cannot be logged is refused
+        player = sim.data.players[0]
+        copy = sim.data.board.create_copy()
+        with pytest.raises(ValueError):
+            sim.data.do_move(player, ('rotate', 1, copy))
+        assert len(sim.data.log) == 20
+
+    def test_tournament_resumes(self, tmp_path) -> None:
+        """Test that a partly finished tournament only plays the games that
+        are missing from its results file.
+        """
+        path = str(tmp_path / 'results.jsonl')
+        full = run_tournament(path, 4, 2, 1, [3], 2, workers=0)
+        with open(path) as f:
+            lines = f.readlines()
+        with open(path, 'w') as f:
+            f.writelines(lines[:2])
+            f.write('{"seed": ')
+
+        resumed = run_tournament(path, 4, 2, 1, [3], 2, workers=0)
+
+        assert sorted(r['seed'] for r in resumed) == [0, 1, 2, 3]
+        assert summarise(resumed) == summarise(full)
+        assert summarise(full)['RandomPlayer']['games'] == 4
+
+    def test_export_streams_every_frame(self) -> None:
+        """Test that exporting a game writes an animation for every move, and
+        ends with the final board.
+        """
+        game = create_simulator(2, 2, [], 2, seed=4)
+        stream = io.BytesIO()
+        with FrameSink(stream, 750, 750, num_buffers=2) as sink:
+            moves = export_game(game, sink, fps=3)
+
+        stream.seek(0)
+        frames = read_frames(stream, 750, 750)
+        assert moves == 4
+        assert len(frames) == sink.frames_written == 1 + moves * (3 + 1)
+        assert np.array_equal(frames[-1], rasterise(game.data.board))
+
+        # An error while writing is raised in the game, which is not left
+        # waiting for a buffer
+        class BrokenStream(io.BytesIO):
+            def write(self, data: bytes) -> int:
+                raise RuntimeError('broken')
+
+        sink = FrameSink(BrokenStream(), 4, 4, num_buffers=1)
+        sink.submit(sink.buffer())
+        frame = sink.buffer()
+        with pytest.raises(RuntimeError):
+            sink.submit(frame)
+        with pytest.raises(RuntimeError):
+            sink.close()
+
+    def test_telemetry_records_every_move(self) -> None:
+        """Test that a record of every move is emitted without waiting, and
+        that a ring buffer keeps only the most recent ones.
+        """
+        ring = RingBufferSink(capacity=4)
+        simulator = create_simulator(3, 1, [2], 3, seed=2)
+        with Telemetry([ring]) as telemetry:
+            simulator.data.telemetry = telemetry
+            simulator.run()
+        assert telemetry.emitted == 6 and telemetry.dropped == 0
+        records = ring.records()
+        assert [(r['turn'], r['player']) for r in records] == \
+            [(1, 0), (1, 1), (2, 0), (2, 1)]
+        assert all(r['valid'] and r['generate_seconds'] >= 0
+                   for r in records)
+
+        # A sink that is stuck does not hold up the game
+        stuck = threading.Event()
+        blocked = RingBufferSink()
+        blocked.write = lambda record: stuck.wait()
+        telemetry = Telemetry([blocked], max_pending=1)
+        for record in records:
+            telemetry.emit(record)
+        assert telemetry.dropped >= 2
+        stuck.set()
+        telemetry.close()
+
+        # A sink that fails does not stop the others, and is still closed
+        closed = []
+        broken = RingBufferSink()
+        broken.write = lambda record: 1 / 0
+        broken.close = lambda: closed.append(broken)
+        ring = RingBufferSink()
+        with Telemetry([broken, ring]) as telemetry:
+            for record in records:
+                telemetry.emit(record)
+            telemetry.flush()
+        assert ring.records() == records
+        assert telemetry.errors == len(records) and closed == [broken]
+        telemetry.emit(records[0])
+        assert telemetry.dropped == 1
+
+    def test_instrumentation(self) -> None:
+        """Test that instrumented operations are measured while
+        instrumentation is enabled, and put back when it is disabled.
+        """
+        smash = Block.smash
+        instrument.reset()
+        instrument.enable()
+        try:
+            create_simulator(3, 1, [2], 3, seed=2).run()
+            generate_board(3, 750)
+            stats = instrument.snapshot()
+        finally:
+            instrument.disable()
+        assert Block.smash is smash
+        assert 'BlobGoal.score' in stats or 'PerimeterGoal.score' in stats
+        assert stats['Block.smash']['nodes'] >= stats['Block.smash']['calls']
+
+        generate_board(3, 750)
+        assert instrument.snapshot()['Block.smash']['calls'] == \
+            stats['Block.smash']['calls']
+
+    def test_profile_headless_game(self, tmp_path, capsys) -> None:
+        """Test that profiling a headless game writes the profile and a
+        trace with one record per move.
+        """
+        prefix = str(tmp_path / 'game')
+        game_main(['--config', 'custom', '--random', '1', '--smart', '2',
+                   '--turns', '3', '--seed', '5', '--headless',
+                   '--profile', prefix])
+        assert os.path.getsize(prefix + '.prof') > 0
+        with open(prefix + '.moves.jsonl') as f:
+            trace = [json.loads(line) for line in f]
+        assert [record['move'] for record in trace] == list(range(6))
+        assert [record['player'] for record in trace] == [0, 1] * 3
+        assert 'Player 0' in capsys.readouterr().out
+
+    def test_game_options(self, capsys) -> None:
+        """Test that choosing the players implies a custom game, and that
+        they cannot be chosen along with a predefined game.
+        """
+        game_main(['--smart', '2', '2', '--turns', '1', '--headless'])
+        assert 'Player 1' in capsys.readouterr().out
+        with pytest.raises(SystemExit):
+            game_main(['--config', 'auto', '--max-depth', '5', '--headless'])
+
+
+class TestBenchmark:
+    """A collection of methods that test the benchmark suite.
+    """
+    def test_regressions_are_reported(self) -> None:
+        """Test that a benchmark that got slower than its baseline is
+        reported, and one that did not is not.
+        """
+        results = run_benchmarks([2, 3], ['rotate', 'combine'], min_time=0)
+        assert set(results['results']['rotate']) == {'2', '3'}
+        assert compare(results, results) == []
+
+        baseline = json.loads(json.dumps(results))
+        baseline['results']['rotate']['3']['median'] /= 2
+        regressions = compare(results, baseline, threshold=0.5)
+        assert [(name, depth) for name, depth, _, _ in regressions] == \
+            [('rotate', '3')]
+
+        # The deepest boards need more recursion than Python allows by default
+        results = run_benchmarks([7], ['BlobGoal.score'], min_time=0)
+        assert 'median' in results['results']['BlobGoal.score']['7']
+
+    def test_turn_latency(self) -> None:
+        """Test that the turn benchmark times every move of the player.
+        """
+        results = run_turn_benchmarks([2], ['RandomPlayer', 'SmartPlayer(1)'],
+                                      num_turns=3)
+        for timing in results['results'].values():
+            assert timing['2']['runs'] == 3
+            assert timing['2']['median'] <= timing['2']['p95'] <= \
+                timing['2']['p99']
+            assert timing['2']['moves_per_sec'] > 0
+            assert timing['2']['peak_bytes_per_move'] > 0
+
+    def test_memory_footprint(self) -> None:
+        """Test that the memory benchmark measures boards and every move of
+        the player, and reports memory regressions.
+        """
+        results = run_memory_benchmarks([2], ['SmartPlayer(1)'], num_turns=2)
+        board = results['results']['Block']['2']
+        assert board['blocks'] >= 1
+        assert board['bytes_per_node'] > 0
+        usage = results['results']['SmartPlayer(1)']['2']
+        assert usage['runs'] == 2
+        assert 0 < usage['peak_bytes'] <= usage['max_peak_bytes']
+
+        baseline = json.loads(json.dumps(results))
+        baseline['results']['Block']['2']['bytes_per_node'] /= 2
+        regressions = compare(results, baseline,
+                              columns=('bytes_per_node', 'peak_bytes'))
+        assert [(name, depth) for name, depth, _, _ in regressions] == \
+            [('Block', '2')]
+
 
 if __name__ == '__main__':
     pytest.main(['example_tests.py'])
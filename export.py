@@ -0,0 +1,230 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a FrameSink, which writes frames of pixels to a file on a
+background thread, and a function that plays a game without a screen and
+streams every frame of it, animations included, to a FrameSink.
+
+Frames are written as raw RGB bytes, one after another, which can be played or
+encoded by tools like ffmpeg:
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 750x750 -r 30 -i game.rgb game.mp4
+
+A FrameSink can also write into the standard input of an encoder started with
+subprocess, so that the encoded file is produced while the game is played.
+
+A FrameSink owns a fixed number of pixel buffers. A game asks for a free
+buffer, draws a frame into it and submits it; once the frame is written, the
+buffer is free to be used again. If the writer falls behind, asking for a
+buffer waits until one is free, so memory use stays bounded.
+"""
+from __future__ import annotations
+from typing import BinaryIO, List, Optional
+import queue
+import threading
+
+import numpy as np
+
+from raster import PixelRenderer, board_squares
+from settings import ANIMATION_DURATION
+from simulator import Simulator
+
+
+class FrameSink:
+    """Writes frames of pixels to a binary stream on a background thread.
+
+    === Public Attributes ===
+    width:
+        The width of every frame, in pixels.
+    height:
+        The height of every frame, in pixels.
+    frames_written:
+        The number of frames written to the stream so far.
+    """
+    # === Private Attributes ===
+    # _stream:
+    #   The stream that frames are written to.
+    # _free:
+    #   The pixel buffers that are not in use.
+    # _pending:
+    #   The submitted frames that have not been written yet, and the number of
+    #   times to write each one, followed by None once the sink is closed.
+    # _thread:
+    #   The thread that writes frames.
+    # _error:
+    #   The error that stopped the thread from writing, if any.
+    width: int
+    height: int
+    frames_written: int
+    _stream: BinaryIO
+    _free: queue.Queue
+    _pending: queue.Queue
+    _thread: threading.Thread
+    _error: Optional[Exception]
+
+    def __init__(self, stream: BinaryIO, width: int, height: int,
+                 num_buffers: int = 8) -> None:
+        """Initialize a sink that writes <width> by <height> frames to
+        <stream>, with <num_buffers> pixel buffers.
+
+        The stream is not closed by this sink.
+
+        Precondition: num_buffers >= 1
+        """
+        self.width = width
+        self.height = height
+        self.frames_written = 0
+        self._stream = stream
+        self._free = queue.Queue()
+        for _ in range(num_buffers):
+            self._free.put(np.empty((height, width, 3), dtype=np.uint8))
+        self._pending = queue.Queue(maxsize=num_buffers)
+        self._error = None
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> FrameSink:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def buffer(self) -> np.ndarray:
+        """Return a free pixel buffer of shape (height, width, 3) to draw the
+        next frame into, waiting for one to be written if none are free.
+
+        The buffer must be given back with submit.
+        """
+        return self._free.get()
+
+    def submit(self, pixels: np.ndarray, repeat: int = 1) -> None:
+        """Write the frame in <pixels>, a buffer returned by self.buffer,
+        <repeat> times in a row.
+
+        Raise the error that stopped frames from being written, if any.
+        """
+        if self._error is not None:
+            raise self._error
+        self._pending.put((pixels, repeat))
+
+    def close(self) -> None:
+        """Write every submitted frame, then stop the background thread.
+
+        Raise the error that stopped frames from being written, if any.
+        """
+        if self._thread.is_alive():
+            self._pending.put(None)
+            self._thread.join()
+        self._stream.flush()
+        if self._error is not None:
+            raise self._error
+
+    def _write(self) -> None:
+        """Write submitted frames until the sink is closed.
+        """
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            pixels, repeat = item
+            try:
+                if self._error is None:
+                    data = memoryview(pixels).cast('B')
+                    for _ in range(repeat):
+                        self._stream.write(data)
+                    self.frames_written += repeat
+            except Exception as e:
+                # Keep taking frames so that the game is not stuck waiting for
+                # a free buffer; submit and close report the error
+                self._error = e
+            finally:
+                self._free.put(pixels)
+
+
+def _emit(sink: FrameSink, renderer: PixelRenderer, repeat: int) -> None:
+    """Copy the pixels of <renderer> into a buffer of <sink> and submit it
+    <repeat> times.
+    """
+    frame = sink.buffer()
+    np.copyto(frame, renderer.pixels)
+    sink.submit(frame, repeat)
+
+
+def export_game(simulator: Simulator, sink: FrameSink,
+                fps: int = 30) -> int:
+    """Play the rest of the game of <simulator>, and write the frames that a
+    Game running at <fps> frames per second would show to <sink>.
+
+    Each move is shown as it is animated by AnimateMoveState, for
+    ANIMATION_DURATION seconds, followed by a frame of the board after the
+    move. Return the number of moves made.
+
+    Precondition: sink.width and sink.height are the size of the board
+    """
+    board = simulator.data.board
+    renderer = PixelRenderer(sink.width, sink.height)
+    renderer.draw_board(board_squares(board))
+    _emit(sink, renderer, 1)
+
+    animation_frames = max(1, round(ANIMATION_DURATION * fps))
+    moves = 0
+    while not simulator.is_over():
+        action = simulator.step()
+        if action is None:
+            continue
+        # The renderer still shows the board before the move
+        block = simulator.last_move[2]
+        renderer.highlight_block(block.position, block.size)
+        renderer.draw_image(action, block.position, block.size)
+        _emit(sink, renderer, animation_frames)
+
+        renderer.draw_board(board_squares(board))
+        _emit(sink, renderer, 1)
+        moves += 1
+    return moves
+
+
+def read_frames(stream: BinaryIO, width: int, height: int) -> List[np.ndarray]:
+    """Return every frame of <width> by <height> pixels in <stream>, which
+    was written by a FrameSink.
+    """
+    data = np.frombuffer(stream.read(), dtype=np.uint8)
+    return list(data.reshape(-1, height, width, 3))
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from simulator import create_simulator
+
+    # Export a game like create_auto_game to the file given on the command
+    # line, or game.rgb
+    path = sys.argv[1] if len(sys.argv) > 1 else 'game.rgb'
+    game = create_simulator(3, 0, [5, 10], 5, seed=0)
+    size = game.data.board.size
+    start = time.perf_counter()
+    with open(path, 'wb') as f:
+        with FrameSink(f, size, size) as frame_sink:
+            export_game(game, frame_sink)
+    elapsed = time.perf_counter() - start
+    print(f'{frame_sink.frames_written} frames in {elapsed:.2f}s '
+          f'({frame_sink.frames_written / elapsed:.1f} frames/sec)')
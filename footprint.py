@@ -0,0 +1,197 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains functions that measure how much memory boards and computer
+players use, with tracemalloc, so that changes to how a Block is stored can be
+judged on real numbers.
+
+measure_board reports the bytes used by each Block of a board, both when it is
+generated and when it is copied with create_copy. measure_turns plays a game
+between a RandomPlayer and the player being measured, and reports the peak
+memory allocated while that player generates each move, and the memory that
+is still in use after each turn, which grows if anything is kept between
+moves. The game is made by create_turn_game and played by play_turns in a
+Simulator, as headless games are, and benchmark.time_turns uses both of them
+too, so that the same moves are timed and measured.
+
+Every size is in bytes, as counted by tracemalloc, which includes the memory
+of every object allocated by Python but not memory that tracemalloc itself
+uses. Tracing slows Python down, so these numbers should not be compared with
+timings.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import contextlib
+import gc
+import random
+import statistics
+import tracemalloc
+
+from block import Block, generate_board
+from game_data import GameData
+from player import Player, create_players
+from settings import BOARD_SIZE
+from simulator import Simulator
+
+# A move, as returned by Player.generate_move
+Move = Tuple[str, Optional[int], Block]
+
+
+@contextlib.contextmanager
+def _tracing() -> Iterator[None]:
+    """Trace memory allocations inside the with block, unless they are
+    already being traced.
+    """
+    if tracemalloc.is_tracing():
+        yield
+        return
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+
+
+def _in_use() -> int:
+    """Return the number of bytes in use after collecting garbage.
+    """
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def count_blocks(board: Block) -> int:
+    """Return the number of Blocks in <board>, including itself.
+    """
+    count = 0
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        count += 1
+        stack.extend(block.children)
+    return count
+
+
+def measure_board(depth: int, seed: int = 0) -> Dict[str, float]:
+    """Return the memory used by a randomly generated board of <depth>.
+
+    The result has the number of 'blocks' in the board, the 'board_bytes'
+    it uses and the 'bytes_per_node', and the 'copy_bytes_per_node' used by
+    a copy of it made with create_copy.
+    """
+    random.seed(seed + depth)
+    with _tracing():
+        before = _in_use()
+        board = generate_board(depth, BOARD_SIZE)
+        board_bytes = _in_use() - before
+
+        before = _in_use()
+        copy = board.create_copy()
+        copy_bytes = _in_use() - before
+    del copy
+
+    blocks = count_blocks(board)
+    return {
+        'blocks': blocks,
+        'board_bytes': board_bytes,
+        'bytes_per_node': board_bytes / blocks,
+        'copy_bytes_per_node': copy_bytes / blocks
+    }
+
+
+def create_turn_game(difficulty: Optional[int], depth: int,
+                     seed: int = 0) -> Tuple[GameData, Player]:
+    """Return a game between a RandomPlayer and a player to be measured, on a
+    randomly generated board of <depth>, along with the measured player.
+
+    The measured player is a SmartPlayer with <difficulty>, or a RandomPlayer
+    if <difficulty> is None. The same <seed> always gives the same game.
+    """
+    random.seed(seed + depth)
+    board = generate_board(depth, BOARD_SIZE)
+    smart_players = [] if difficulty is None else [difficulty]
+    players = create_players(0, 2 - len(smart_players), smart_players)
+    return GameData(board, players), players[-1]
+
+
+def play_turns(data: GameData, measured: Player, num_turns: int,
+               measure: Callable[[Callable[[], Optional[Move]]],
+                                 Optional[Move]]) -> None:
+    """Play <num_turns> turns of the game with <data> in a Simulator.
+
+    Every move of <measured> is generated by calling <measure> with a
+    function that generates it and returns it, so that it can be measured.
+    """
+    simulator = Simulator(data, num_turns)
+    generate_move = measured.generate_move
+    measured.generate_move = \
+        lambda board: measure(lambda: generate_move(board))
+    try:
+        simulator.run()
+    finally:
+        del measured.generate_move
+
+
+def measure_turns(difficulty: Optional[int], depth: int, num_turns: int,
+                  seed: int = 0) -> Dict[str, float]:
+    """Return the memory used by a player in the game made by
+    create_turn_game, for <num_turns> turns.
+
+    The game is the same as the one timed by benchmark.time_turns.
+
+    The result has the median and the largest 'peak_bytes' allocated while
+    the player generates a move, above what was in use before it started,
+    the 'retained_bytes' still in use after the last turn that were not in
+    use before the first, and the 'retained_per_turn'.
+    """
+    data, measured = create_turn_game(difficulty, depth, seed)
+    peaks = []
+
+    def measure(generate: Callable[[], Optional[Move]]) -> Optional[Move]:
+        before = _in_use()
+        tracemalloc.reset_peak()
+        move = generate()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        return move
+
+    with _tracing():
+        start = _in_use()
+        play_turns(data, measured, num_turns, measure)
+        retained = _in_use() - start
+
+    return {
+        'peak_bytes': statistics.median(peaks),
+        'max_peak_bytes': max(peaks),
+        'retained_bytes': retained,
+        'retained_per_turn': retained / num_turns,
+        'runs': len(peaks)
+    }
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'contextlib', 'gc',
+            'random', 'statistics', 'tracemalloc', 'block', 'game_data',
+            'player', 'settings', 'simulator'
+        ]
+    })
@@ -25,14 +25,74 @@ Blocky game.
 At the bottom of the file, there are some function that you
 can call to try playing the game in several different configurations.
 """
-from typing import List
+from typing import Dict, List, Optional, Tuple
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import time
 import pygame
 
+from actions import ACTION_LABEL
 from block import generate_board
 from blocky import GameData, GameState, MainState
 from player import create_players
 from renderer import Renderer
+from replay import MoveLog
 from settings import BOARD_SIZE
+from simulator import create_simulator
+from telemetry import JsonlSink, Telemetry
+
+
+# The number of frames per second that the game is drawn at
+FRAME_RATE = 30
+
+# The longest time, in milliseconds, that an idle game waits for an event
+IDLE_TIMEOUT = 1000
+
+
+class LoopStats:
+    """The number of frames drawn and moves made by a running game, which are
+    counted separately since moves are not made once per frame.
+
+    === Public Attributes ===
+    frames:
+        The number of frames the game has run for.
+    drawn:
+        The number of those frames in which the screen changed.
+    moves:
+        The number of moves made, not counting moves that were undone.
+    """
+    # === Private Attributes ===
+    # _start:
+    #   The time, in seconds, that counting started.
+    frames: int
+    drawn: int
+    moves: int
+    _start: float
+
+    def __init__(self) -> None:
+        """Start counting from now.
+        """
+        self.frames = 0
+        self.drawn = 0
+        self.moves = 0
+        self._start = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Return the number of seconds since counting started.
+        """
+        return time.perf_counter() - self._start
+
+    def __str__(self) -> str:
+        """Return the frame rate and the move rate since counting started.
+        """
+        elapsed = max(self.elapsed(), 1e-9)
+        return f'{self.frames / elapsed:.1f} FPS ' \
+               f'({self.drawn / elapsed:.1f} drawn) | ' \
+               f'{self.moves / elapsed:.2f} moves/sec'
 
 
 class Game:
@@ -52,69 +112,286 @@ class Game:
     def __init__(self, max_depth: int,
                  num_human: int,
                  num_random: int,
-                 smart_players: List[int]) -> None:
+                 smart_players: List[int],
+                 seed: Optional[int] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 background_moves: bool = True) -> None:
         """Initialize this game, as described in the Assignment 2 handout.
 
+        If <seed> is not None, the random module is seeded with it before the
+        board is generated, so that the same seed always gives the same game.
+        Otherwise, the board is generated from a randomly chosen seed of its
+        own, and the random module is left as it is. Every move is recorded in
+        a MoveLog, which can be replayed using this seed, and emitted to
+        <telemetry>, if it is not None.
+
+        If <background_moves> is False, computer players generate their moves
+        on the main thread, which stops the game being drawn while they do,
+        but lets a profiler of the main thread see them.
+
         Precondition:
             2 <= max_depth <= 5
         """
-        board = generate_board(max_depth, BOARD_SIZE)
+        if seed is None:
+            seed = random.getrandbits(32)
+            board = generate_board(max_depth, BOARD_SIZE, random.Random(seed))
+        else:
+            random.seed(seed)
+            board = generate_board(max_depth, BOARD_SIZE)
         players = create_players(num_human, num_random, smart_players)
 
-        self._renderer = Renderer(BOARD_SIZE)
+        self._renderer = Renderer(BOARD_SIZE, max_depth)
         self._data = GameData(board, players)
-        self._state = MainState(self._data)
+        self._data.log = MoveLog(seed, max_depth, BOARD_SIZE,
+                                 [p.goal.colour for p in players])
+        self._data.telemetry = telemetry
+        self._state = MainState(self._data, background_moves)
 
-    def run_game(self, num_turns: int) -> None:
+    def run_game(self, num_turns: int, idle: bool = True,
+                 trace: Optional[List[Dict[str, object]]] = None) -> LoopStats:
         """Start the main game loop and stop after num_turns.
+
+        Unless background moves were turned off, computer players decide on
+        their moves in the background, so the game keeps being drawn at
+        FRAME_RATE however long they take. The frame rate and the move rate are
+        shown in the window's title every second, and returned once the window
+        is closed.
+
+        If <idle> is True, the game sleeps until the next event whenever its
+        state is not animating, and is only drawn again when an event changes
+        what would be drawn.
+
+        If <trace> is not None, a record of every move is appended to it, as
+        described in _trace_move.
         """
         self._data.max_turns = num_turns
         clock = pygame.time.Clock()
+        stats = LoopStats()
+        last_report = 0
+        redraw = True
 
         while True:
-            clock.tick(30)
-
-            # Process events
-            for e in pygame.event.get():
+            clock.tick(FRAME_RATE)
+
+            # Process events, waiting for one if there is nothing to animate
+            if idle and not self._state.is_animating():
+                events = [pygame.event.wait(IDLE_TIMEOUT)]
+                events.extend(pygame.event.get())
+            else:
+                events = pygame.event.get()
+                redraw = True
+            for e in events:
                 if e.type == pygame.QUIT:
-                    return
-                else:
+                    return stats
+                elif e.type != pygame.NOEVENT:
+                    redraw = redraw or self._state.needs_redraw(e)
                     self._state.process_event(e)
 
             # Update the state of the game
-            self._state = self._state.update()
-
-            # Render the new state of the game
-            self._renderer.clear()
-            self._state.render(self._renderer)
-
-            # Update the screen
-            pygame.display.flip()
-
-
-def create_auto_game() -> Game:
+            state = self._state.update()
+            redraw = redraw or state is not self._state
+            self._state = state
+
+            # Render the new state of the game, if it may have changed
+            if redraw or not idle:
+                self._state.render(self._renderer)
+                redraw = False
+
+            # Update the parts of the screen that changed, if any
+            stats.frames += 1
+            if self._renderer.present():
+                stats.drawn += 1
+            if trace is not None and len(self._data.log) > stats.moves:
+                _trace_move(trace, self._data, len(self._data.log) - 1,
+                            stats.elapsed())
+            stats.moves = len(self._data.log)
+
+            if int(stats.elapsed()) > last_report:
+                last_report = int(stats.elapsed())
+                pygame.display.set_caption(f'Blocky | {stats}')
+
+
+def _trace_move(trace: List[Dict[str, object]], data: GameData, index: int,
+                elapsed: float) -> None:
+    """Append a record of the move at <index> of the log of <data> to
+    <trace>, which was made <elapsed> seconds into the game.
+
+    The record holds the number of the move, its turn, the ID of the player
+    who made it, its action, the time it was made, and the time since the
+    previous move. The turn assumes that no moves were undone.
+    """
+    player_id, action, _, _ = data.log.move(index)
+    previous = trace[-1]['time'] if trace else 0.0
+    trace.append({
+        'move': index,
+        'turn': index // len(data.players),
+        'player': player_id,
+        'action': ACTION_LABEL[action],
+        'time': elapsed,
+        'seconds': elapsed - previous
+    })
+
+
+# The games that can be chosen by name, as the arguments to Game: max_depth,
+# num_human, num_random and smart_players
+GAME_CONFIGS = {
+    'auto': (3, 0, 0, [5, 10]),
+    'two_player': (3, 2, 0, []),
+    'solitaire': (3, 1, 0, []),
+    'sample': (3, 1, 1, [6])
+}
+
+
+def create_auto_game(seed: Optional[int] = None) -> Game:
     """Run a game with two computer players of different "difficulty".
     """
-    return Game(3, 0, 0, [5, 10])
+    return Game(*GAME_CONFIGS['auto'], seed=seed)
 
 
-def create_two_player_game() -> Game:
+def create_two_player_game(seed: Optional[int] = None) -> Game:
     """Run a game with two human players.
     """
-    return Game(3, 2, 0, [])
+    return Game(*GAME_CONFIGS['two_player'], seed=seed)
 
 
-def create_solitaire_game() -> Game:
+def create_solitaire_game(seed: Optional[int] = None) -> Game:
     """Run a game with one human player.
     """
-    return Game(3, 1, 0, [])
+    return Game(*GAME_CONFIGS['solitaire'], seed=seed)
 
 
-def create_sample_game() -> Game:
+def create_sample_game(seed: Optional[int] = None) -> Game:
     """Run a sample game with one human player, one random player,
     and one smart player.
     """
-    return Game(3, 1, 1, [6])
+    return Game(*GAME_CONFIGS['sample'], seed=seed)
+
+
+def run_headless(max_depth: int, num_random: int, smart_players: List[int],
+                 num_turns: int, seed: Optional[int] = None,
+                 trace: Optional[List[Dict[str, object]]] = None,
+                 telemetry: Optional[Telemetry] = None) \
+        -> List[Tuple[int, int, int]]:
+    """Play a game like Game(max_depth, 0, num_random, smart_players) for
+    <num_turns> turns without a screen, as fast as possible, and return each
+    player's ID, goal score, and penalty.
+
+    If <trace> is not None, a record of every move is appended to it, as
+    described in _trace_move. If <telemetry> is not None, every move is
+    emitted to it.
+    """
+    simulator = create_simulator(max_depth, num_random, smart_players,
+                                 num_turns, seed, record=True)
+    simulator.data.telemetry = telemetry
+    start = time.perf_counter()
+    while not simulator.is_over():
+        simulator.step()
+        if trace is not None and len(simulator.data.log) > len(trace):
+            _trace_move(trace, simulator.data, len(simulator.data.log) - 1,
+                        time.perf_counter() - start)
+    return simulator.scores()
+
+
+def _parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """Return the options given on the command line <args>.
+    """
+    parser = argparse.ArgumentParser(description='Play a game of Blocky.')
+    parser.add_argument('--config', choices=list(GAME_CONFIGS) + ['custom'],
+                        help='a predefined game (two_player if none of the '
+                             'options below is given), or custom to choose '
+                             'the players and depth below')
+    parser.add_argument('--max-depth', type=int,
+                        help='the max_depth of the board (custom only, '
+                             'default 3)')
+    parser.add_argument('--humans', type=int,
+                        help='the number of human players (custom only)')
+    parser.add_argument('--random', type=int,
+                        help='the number of random players (custom only)')
+    parser.add_argument('--smart', type=int, nargs='*', metavar='DIFFICULTY',
+                        help='the difficulty of each smart player (custom '
+                             'only)')
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--seed', type=int,
+                        help='the seed of the board and every move')
+    parser.add_argument('--headless', action='store_true',
+                        help='play without a window, as fast as possible')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='write cProfile stats to PREFIX.prof and a '
+                             'trace of every move to PREFIX.moves.jsonl; '
+                             'computer moves are generated on the main '
+                             'thread so that they are profiled')
+    parser.add_argument('--telemetry', metavar='PATH',
+                        help='write a telemetry record of every move to PATH, '
+                             'as JSON lines (see telemetry.py)')
+    parser.add_argument('--instrument', action='store_true',
+                        help='measure the hot operations (see instrument.py)')
+    options = parser.parse_args(args)
+
+    # Choosing the players or depth implies a custom game
+    custom = [name for name in ('max_depth', 'humans', 'random', 'smart')
+              if getattr(options, name) is not None]
+    if options.config is None:
+        options.config = 'custom' if custom else 'two_player'
+    if options.config != 'custom':
+        if custom:
+            parser.error(f"--{custom[0].replace('_', '-')} cannot be used "
+                         f"with --config {options.config}")
+        options.max_depth, options.humans, options.random, options.smart = \
+            GAME_CONFIGS[options.config]
+    else:
+        defaults = {'max_depth': 3, 'humans': 0, 'random': 0, 'smart': []}
+        for name, default in defaults.items():
+            if getattr(options, name) is None:
+                setattr(options, name, default)
+    if options.headless and options.humans:
+        parser.error('a headless game cannot have human players')
+    if options.humans + options.random + len(options.smart) == 0:
+        parser.error('a game needs at least one player')
+    return options
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Play the game chosen on the command line <args>.
+    """
+    options = _parse_args(args)
+    if options.instrument or os.environ.get('BLOCKY_INSTRUMENT'):
+        import instrument
+        instrument.enable()
+
+    trace = [] if options.profile else None
+    telemetry = None
+    if options.telemetry:
+        telemetry = Telemetry([JsonlSink(options.telemetry)])
+    profiler = cProfile.Profile() if options.profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        if options.headless:
+            scores = run_headless(options.max_depth, options.random,
+                                  options.smart, options.turns, options.seed,
+                                  trace, telemetry)
+            for player_id, goal_score, penalty in scores:
+                print(f'Player {player_id}: {goal_score} - {penalty} = '
+                      f'{goal_score - penalty}')
+        else:
+            pygame.init()
+            game = Game(options.max_depth, options.humans, options.random,
+                        options.smart, options.seed, telemetry,
+                        background_moves=profiler is None)
+            print(game.run_game(options.turns, trace=trace))
+            pygame.quit()
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(f'{options.profile}.prof')
+        with open(f'{options.profile}.moves.jsonl', 'w') as f:
+            for record in trace:
+                f.write(json.dumps(record) + '\n')
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
 
 
 if __name__ == '__main__':
@@ -128,22 +405,11 @@ if __name__ == '__main__':
     #     'generated-members': 'pygame.*'
     # })
 
-    pygame.init()
-
-    # If you want to run the same game sequence each time, to assist with
-    # debugging, uncomment-out the call to random.seed.
-    # import random
-    # random.seed(1001)
-
-    # game = create_sample_game()
-    # game = create_auto_game()
-    game = create_two_player_game()
-    # game = create_solitaire_game()
-
-    # game = Game(3, 0, 0, [100, 100])
-
-    # Run the game for 5 turns
-    game.run_game(5)
-    # game.run_game(1000)
-
-    pygame.quit()
+    # Run a two player game for 5 turns by default. For example, to profile
+    # a long game between two smart players without a window, run:
+    #     python game.py --config custom --smart 100 100 --turns 50 \
+    #         --seed 1001 --headless --profile blocky
+    # Pass --instrument, or set BLOCKY_INSTRUMENT, to measure where the game
+    # spends its time; press I during the game, or wait until it is over, to
+    # print the measurements.
+    main()
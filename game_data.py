@@ -0,0 +1,202 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the GameData class, which holds the state of a Blocky game
+that is shared between game states. It does not depend on pygame, so that games
+can also be run without a screen (see simulator.py).
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import random
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
+from block import Block, get_path
+from player import Player, AdversarialPlayer
+from replay import MoveLog
+from telemetry import Telemetry
+
+
+class GameData:
+    """
+    A bundle of the data needed for a Blocky game.
+
+    === Public Attributes ===
+    max_turns:
+        The maximum number of turns for the game.
+    board:
+        The Blocky board on which this game will be played.
+    players:
+        The entities that are playing this game.
+    smashes:
+        The number of smashes done by each player.
+    combines:
+        The number of combines done by each player.
+    paints:
+        The number of paints done by each player.
+    log:
+        The log that every successful move is recorded in, or None if the
+        moves are not being recorded.
+    telemetry:
+        The Telemetry that a record of every move is emitted to, or None if
+        there is none (see telemetry.py).
+    board_version:
+        The number of times the board has changed. Anything that changes the
+        board other than do_move must call board_changed.
+
+    === Representation Invariants ===
+    - len(players) >= 1
+    """
+    # === Private Attributes ===
+    # _scores:
+    #   Maps the ID of a player to their goal score, and the board and board
+    #   version it was calculated for.
+    max_turns: int
+    board: Block
+    players: List[Player]
+    smashes: Dict[int, int]
+    combines: Dict[int, int]
+    paints: Dict[int, int]
+    log: Optional[MoveLog]
+    telemetry: Optional[Telemetry]
+    board_version: int
+    _scores: Dict[int, Tuple[Block, int, int]]
+
+    def __init__(self, board: Block, players: List[Player]) -> None:
+        """Initialize the game data, saving a reference to <board> and
+        <players>.
+
+        Precondition:
+            - len(players) >= 1
+        """
+        self.max_turns = 0
+        self.board = board
+        self.players = players
+
+        self.smashes = {}
+        self.combines = {}
+        self.paints = {}
+        self.log = None
+        self.telemetry = None
+        self.board_version = 0
+        self._scores = {}
+
+        # Start off all counts at 0
+        for player in players:
+            self.smashes[player.id] = 0
+            self.combines[player.id] = 0
+            self.paints[player.id] = 0
+
+        # Let players that search ahead know who they are playing against
+        for player in players:
+            if isinstance(player, AdversarialPlayer):
+                player.observe_players(players)
+
+    def calculate_score(self, player_id: int) -> Tuple[int, int]:
+        """Return a tuple containing first the <player_id>'s score based on
+        their goal in the game and second the deductions from their score based
+        on the actions they've taken.
+
+        The goal score is only calculated again if the board has changed since
+        it was last calculated for this player.
+        """
+        cached = self._scores.get(player_id)
+        if cached is not None and cached[0] is self.board and \
+                cached[1] == self.board_version:
+            goal_score = cached[2]
+        else:
+            goal_score = self.players[player_id].goal.score(self.board)
+            self._scores[player_id] = (self.board, self.board_version,
+                                       goal_score)
+
+        penalty = self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
+                  self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
+                  self.paints[player_id] * ACTION_PENALTY[PAINT]
+
+        return goal_score, penalty
+
+    def board_changed(self) -> None:
+        """Record that the board has changed, so that scores are calculated
+        again.
+        """
+        self.board_version += 1
+
+    def do_move(self, player: Player,
+                move: Tuple[str, Optional[int], Block]) -> bool:
+        """Attempt to do the <move> requested by <player>, counting it towards
+        the player's penalties if it is successful.
+
+        If this game has a log, the move is recorded in it if it is successful.
+        Raise a ValueError, without doing the move, if this game has a log and
+        the block of <move> is not on the board, since the move could not be
+        recorded.
+
+        Return True iff the move was successful.
+        """
+        action = (move[0], move[1])
+        direction = move[1]
+        block = move[2]
+        move_successful = False
+        path, smash_seed = None, None
+        if self.log is not None:
+            path = get_path(self.board, block)
+            if path is None:
+                raise ValueError('Cannot log a move on a block that is not '
+                                 'on the board')
+
+        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
+            move_successful = block.rotate(direction)
+        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
+            move_successful = block.swap(direction)
+        elif action == SMASH:
+            if self.log is None:
+                move_successful = block.smash()
+            else:
+                # Smash with a known seed, so that it can be replayed
+                smash_seed = random.getrandbits(32)
+                move_successful = block.smash(random.Random(smash_seed))
+            self.smashes[player.id] += int(move_successful)
+        elif action == PAINT:
+            move_successful = block.paint(player.goal.colour)
+            self.paints[player.id] += int(move_successful)
+        elif action == COMBINE:
+            move_successful = block.combine()
+            self.combines[player.id] += int(move_successful)
+        elif action == PASS:
+            # Do nothing
+            move_successful = True
+
+        if move_successful and action != PASS:
+            self.board_changed()
+        if move_successful and self.log is not None:
+            self.log.append(player.id, action, path, smash_seed)
+        return move_successful
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'actions', 'block',
+            'player', 'random', 'replay', 'telemetry'
+        ]
+    })
@@ -0,0 +1,321 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the History class, which lets the moves of a game be undone
+and redone.
+
+Instead of copying the board before every move, each move is recorded with
+just enough information to reverse it: the path to the block, and whatever
+the move threw away. Rotates and swaps are undone by the opposite move, a
+paint by the old colour, and a combine by the old children, which are kept by
+reference rather than copied. A smash keeps the encoding of the new subtree so
+that it can be redone exactly. A full snapshot of the board is only taken every
+few moves, so that far away moves can be reached quickly.
+"""
+from __future__ import annotations
+from typing import Container, Dict, List, Optional, Tuple
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, COMBINE, PAINT
+from block import Block, get_descendant, get_path
+from game_data import GameData
+from player import Player, _perform
+from serialize import decode_board, encode_board
+
+
+class _Record:
+    """A move that can be undone and redone.
+
+    === Public Attributes ===
+    turn:
+        The turn the move was made on.
+    player_index:
+        The index in GameData.players of the player who made the move.
+    action:
+        The action of the move.
+    path:
+        The path from the board to the block the move was made on.
+    colour:
+        The colour of the block before the move.
+    paint_colour:
+        The colour the block was painted, or None if the move is not a paint.
+    children:
+        The children of the block before a combine, or None for other moves.
+    subtree:
+        The encoding of the block after a smash, or None for other moves.
+    log_entry:
+        The encoding of the move in the game's MoveLog, or None if the game is
+        not logged.
+    """
+    turn: int
+    player_index: int
+    action: Tuple[str, Optional[int]]
+    path: List[int]
+    colour: Optional[Tuple[int, int, int]]
+    paint_colour: Optional[Tuple[int, int, int]]
+    children: Optional[List[Block]]
+    subtree: Optional[bytes]
+    log_entry: Optional[bytes]
+
+    def __init__(self, turn: int, player_index: int,
+                 action: Tuple[str, Optional[int]], path: List[int]) -> None:
+        self.turn = turn
+        self.player_index = player_index
+        self.action = action
+        self.path = path
+        self.colour = None
+        self.paint_colour = None
+        self.children = None
+        self.subtree = None
+        self.log_entry = None
+
+
+class History:
+    """The moves made so far in a game, which can be undone and redone.
+
+    Undoing a move also takes back the penalty it cost, and removes it from
+    the game's MoveLog.
+    """
+    # === Private Attributes ===
+    # _data:
+    #   The data of the game whose moves are recorded.
+    # _records:
+    #   Every recorded move, including those that have been undone.
+    # _position:
+    #   The number of moves in _records that have not been undone.
+    # _snapshot_interval:
+    #   The number of moves between snapshots.
+    # _snapshots:
+    #   Maps a number of moves to the encoded board and the smashes, combines
+    #   and paints counts after that many moves.
+    _data: GameData
+    _records: List[_Record]
+    _position: int
+    _snapshot_interval: int
+    _snapshots: Dict[int, Tuple[bytes, Dict[int, int], Dict[int, int],
+                                Dict[int, int]]]
+
+    def __init__(self, data: GameData, snapshot_interval: int = 20) -> None:
+        """Initialize an empty history for the game with <data>.
+
+        Precondition: snapshot_interval >= 1
+        """
+        self._data = data
+        self._records = []
+        self._position = 0
+        self._snapshot_interval = snapshot_interval
+        self._snapshots = {}
+        self._take_snapshot()
+
+    def __len__(self) -> int:
+        """Return the number of moves that have been made and not undone.
+        """
+        return self._position
+
+    def can_undo(self) -> bool:
+        """Return True iff there is a move that can be undone.
+        """
+        return self._position > 0
+
+    def can_redo(self) -> bool:
+        """Return True iff there is an undone move that can be redone.
+        """
+        return self._position < len(self._records)
+
+    def undo_count(self, player_indices: Container[int]) -> int:
+        """Return the number of moves that must be undone to undo the last
+        move made by any of the players at <player_indices> in
+        GameData.players, along with every move made after it, or 0 if none of
+        them has made a move that can be undone.
+        """
+        for i in range(self._position - 1, -1, -1):
+            if self._records[i].player_index in player_indices:
+                return self._position - i
+        return 0
+
+    def redo_count(self, player_indices: Container[int]) -> int:
+        """Return the number of undone moves that must be redone to redo the
+        next one, along with every undone move after it up to the next one
+        made by any of the players at <player_indices> in GameData.players, or
+        0 if there is no move to redo.
+        """
+        if not self.can_redo():
+            return 0
+        i = self._position + 1
+        while i < len(self._records) and \
+                self._records[i].player_index not in player_indices:
+            i += 1
+        return i - self._position
+
+    def do_move(self, player: Player, move: Tuple[str, Optional[int], Block],
+                turn: int, player_index: int) -> bool:
+        """Attempt to do the <move> requested by <player>, whose index in
+        GameData.players is <player_index>, on <turn>, and record it if it is
+        successful. Any moves that were undone can no longer be redone.
+
+        Return True iff the move was successful.
+        """
+        data = self._data
+        block = move[2]
+        path = get_path(data.board, block)
+        if path is None:
+            return data.do_move(player, move)
+
+        record = _Record(turn, player_index, (move[0], move[1]), path)
+        record.colour = block.colour
+        if record.action == COMBINE:
+            record.children = list(block.children)
+        if not data.do_move(player, move):
+            return False
+
+        if record.action == SMASH:
+            record.subtree = encode_board(block)
+        elif record.action == PAINT:
+            record.paint_colour = block.colour
+        if data.log is not None:
+            record.log_entry = data.log.entry(len(data.log) - 1)
+
+        del self._records[self._position:]
+        self._snapshots = {k: v for k, v in self._snapshots.items()
+                           if k <= self._position}
+        self._records.append(record)
+        self._position += 1
+        if self._position % self._snapshot_interval == 0:
+            self._take_snapshot()
+        return True
+
+    def undo(self) -> Optional[Tuple[int, int, List[int]]]:
+        """Undo the last move that has not been undone.
+
+        Return the turn and the player index of the move, and the path to the
+        block it was made on, or None if there is no move to undo.
+        """
+        if not self.can_undo():
+            return None
+        self._position -= 1
+        record = self._records[self._position]
+        block = get_descendant(self._data.board, record.path)
+        action = record.action
+
+        if action in (ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE):
+            block.rotate(4 - action[1])
+        elif action in (SWAP_HORIZONTAL, SWAP_VERTICAL):
+            block.swap(action[1])
+        elif action in (SMASH, PAINT):
+            block.children = []
+            block.colour = record.colour
+        elif action == COMBINE:
+            block.colour = None
+            block.children = list(record.children)
+        self._data.board_changed()
+        self._count_penalty(record, -1)
+
+        if self._data.log is not None:
+            self._data.log.truncate(len(self._data.log) - 1)
+        return record.turn, record.player_index, record.path
+
+    def redo(self) -> Optional[Tuple[int, int, List[int]]]:
+        """Redo the last move that was undone.
+
+        Return the turn and the player index of the move, and the path to the
+        block it was made on, or None if there is no move to redo.
+        """
+        if not self.can_redo():
+            return None
+        record = self._records[self._position]
+        self._apply(record)
+        self._position += 1
+        return record.turn, record.player_index, record.path
+
+    def restore(self, num_moves: int) -> None:
+        """Undo or redo moves until exactly <num_moves> moves have been made.
+
+        When going back many moves, the board is rebuilt from the nearest
+        snapshot instead, so that data.board may become a new Block.
+
+        Precondition: 0 <= num_moves <= the number of recorded moves
+        """
+        start = num_moves - num_moves % self._snapshot_interval
+        while start not in self._snapshots:
+            start -= self._snapshot_interval
+        if num_moves < self._position and \
+                num_moves - start < self._position - num_moves:
+            board, smashes, combines, paints = self._snapshots[start]
+            self._data.board = decode_board(board)
+            self._data.smashes = dict(smashes)
+            self._data.combines = dict(combines)
+            self._data.paints = dict(paints)
+            self._data.board_changed()
+            if self._data.log is not None:
+                self._data.log.truncate(start)
+            self._position = start
+
+        while self._position > num_moves:
+            self.undo()
+        while self._position < num_moves:
+            self.redo()
+
+    def _apply(self, record: _Record) -> None:
+        """Do the move of <record> again, exactly as it was first done.
+        """
+        block = get_descendant(self._data.board, record.path)
+        if record.action == SMASH:
+            block.colour = None
+            block.children = decode_board(record.subtree).children
+        else:
+            _perform(block, record.action, record.paint_colour)
+        self._data.board_changed()
+        self._count_penalty(record, 1)
+
+        if record.log_entry is not None:
+            self._data.log.append_entry(record.log_entry)
+
+    def _count_penalty(self, record: _Record, change: int) -> None:
+        """Add <change> to the count of the penalised action in <record> for
+        the player who made it, if its action is penalised.
+        """
+        player_id = self._data.players[record.player_index].id
+        if record.action == SMASH:
+            self._data.smashes[player_id] += change
+        elif record.action == COMBINE:
+            self._data.combines[player_id] += change
+        elif record.action == PAINT:
+            self._data.paints[player_id] += change
+
+    def _take_snapshot(self) -> None:
+        """Record the board and the penalty counts after the current number of
+        moves.
+        """
+        data = self._data
+        self._snapshots[self._position] = (
+            encode_board(data.board), dict(data.smashes),
+            dict(data.combines), dict(data.paints))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'actions', 'block',
+            'game_data', 'player', 'serialize'
+        ]
+    })
@@ -0,0 +1,225 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains opt-in instrumentation of the operations that a game spends
+most of its time in: the Block operations, goal scoring, _get_block,
+_block_to_squares, and drawing the board.
+
+Calling enable() replaces each of these operations with a wrapper that counts
+its calls, the time spent in it and the number of Blocks (or squares) it
+visits, in a registry of OpStats. Calling disable() puts the original
+operations back, so that nothing is measured, and nothing is slowed down,
+unless instrumentation is enabled.
+
+A recursive operation is only counted and timed once per outermost call, but
+each recursive call counts as a visited node. For example, one _flatten of a
+board with 21 Blocks is 1 call that visits 21 nodes.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
+
+import blocky
+import goal
+import player
+from block import Block
+from renderer import Renderer
+
+
+class OpStats:
+    """The measurements of one instrumented operation.
+
+    === Public Attributes ===
+    calls:
+        The number of times the operation was called, not counting recursive
+        calls.
+    seconds:
+        The total time spent in the operation.
+    nodes:
+        The number of Blocks or squares that the operation visited.
+    """
+    calls: int
+    seconds: float
+    nodes: int
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.nodes = 0
+
+
+def _subtree_size(block: Block, *_: Any) -> int:
+    """Return the number of Blocks in <block>, including itself.
+    """
+    count = 0
+    stack = [block]
+    while stack:
+        b = stack.pop()
+        count += 1
+        stack.extend(b.children)
+    return count
+
+
+def _board_size(_: Any, board: Block) -> int:
+    """Return the number of Blocks in <board>, the second argument of a
+    goal's score method.
+    """
+    return _subtree_size(board)
+
+
+def _num_squares(_: Any, squares: list) -> int:
+    """Return the number of squares given to Renderer.draw_board.
+    """
+    return len(squares)
+
+
+# The operations that are instrumented: the object they belong to, the name of
+# the operation on it, the name to record it under, and a function of the
+# operation's arguments that returns the number of nodes it visits, or None
+# if it visits one node per (recursive) call
+_TARGETS: List[Tuple[Any, str, str, Optional[Callable[..., int]]]] = [
+    (Block, 'smash', 'Block.smash', None),
+    (Block, 'rotate', 'Block.rotate', _subtree_size),
+    (Block, 'swap', 'Block.swap', _subtree_size),
+    (Block, 'combine', 'Block.combine', None),
+    (Block, 'paint', 'Block.paint', None),
+    (Block, 'create_copy', 'Block.create_copy', None),
+    (goal, '_flatten', '_flatten', None),
+    (goal.PerimeterGoal, 'score', 'PerimeterGoal.score', _board_size),
+    (goal.BlobGoal, 'score', 'BlobGoal.score', _board_size),
+    (player, '_get_block', '_get_block', None),
+    (blocky, '_block_to_squares', '_block_to_squares', None),
+    (blocky.SquareCache, 'squares', 'SquareCache.squares', None),
+    (Renderer, 'draw_board', 'Renderer.draw_board', _num_squares)
+]
+
+# Maps the name of each instrumented operation to its measurements
+_registry: Dict[str, OpStats] = {}
+
+# The original operations, while instrumentation is enabled
+_originals: List[Tuple[Any, str, Any]] = []
+
+# The depth of recursion of each operation on each thread
+_depth = threading.local()
+
+
+def _wrap(name: str, function: Callable,
+          count_nodes: Optional[Callable[..., int]]) -> Callable:
+    """Return a function that calls <function>, recording its measurements
+    in the registry under <name>.
+    """
+    stats = _registry.setdefault(name, OpStats())
+
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        depth = getattr(_depth, name, 0)
+        if count_nodes is None:
+            stats.nodes += 1
+        if depth:
+            # A recursive call, which is timed by the outermost call
+            return function(*args, **kwargs)
+
+        setattr(_depth, name, 1)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            setattr(_depth, name, 0)
+            if count_nodes is not None:
+                stats.nodes += count_nodes(*args, **kwargs)
+
+    wrapper.__wrapped__ = function
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+def enable() -> None:
+    """Start measuring the instrumented operations.
+
+    Measurements are added to those already in the registry.
+    """
+    if _originals:
+        return
+    for owner, attribute, name, count_nodes in _TARGETS:
+        # Take the operation defined on the class or module itself, so that
+        # disable puts back exactly what was there
+        original = vars(owner)[attribute]
+        _originals.append((owner, attribute, original))
+        setattr(owner, attribute, _wrap(name, original, count_nodes))
+
+
+def disable() -> None:
+    """Stop measuring, and put back the original operations.
+    """
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+
+
+def is_enabled() -> bool:
+    """Return True iff the instrumented operations are being measured.
+    """
+    return bool(_originals)
+
+
+def reset() -> None:
+    """Forget every measurement.
+    """
+    for stats in _registry.values():
+        stats.calls = 0
+        stats.seconds = 0.0
+        stats.nodes = 0
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """Return a copy of the measurements of every operation that has been
+    called, as dictionaries with 'calls', 'seconds' and 'nodes'.
+    """
+    return {name: dict(vars(stats)) for name, stats in _registry.items()
+            if stats.calls}
+
+
+def report() -> str:
+    """Return a table of the measurements of every operation that has been
+    called, slowest first.
+    """
+    lines = [f'{"operation":<22}{"calls":>9}{"total ms":>11}'
+             f'{"us/call":>10}{"nodes":>11}']
+    for name, stats in sorted(snapshot().items(),
+                              key=lambda item: -item[1]['seconds']):
+        per_call = stats['seconds'] / stats['calls'] * 1e6
+        lines.append(f'{name:<22}{stats["calls"]:>9}'
+                     f'{stats["seconds"] * 1e3:>11.2f}{per_call:>10.1f}'
+                     f'{stats["nodes"]:>11}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'threading',
+            'time', 'blocky', 'goal', 'player', 'block', 'renderer'
+        ]
+    })
@@ -22,14 +22,22 @@ Misha Schwartz, and Jaisie Sin.
 This file contains the hierarchy of player classes.
 """
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 import random
-import pygame
+import time
 
-from block import Block
-from goal import Goal, generate_goals
+from block import Block, get_descendant
+from goal import BlobGoal, Goal, PerimeterGoal, _flatten, generate_goals
+from settings import COLOUR_LIST
 
-from actions import KEY_ACTION, SMASH, PASS, PAINT, COMBINE
+from actions import ACTIONS, SMASH, PASS, PAINT, COMBINE, \
+    ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL, \
+    SWAP_VERTICAL, ACTION_PENALTY
+
+# pygame is only imported by the methods that handle input from a person, so
+# that computer players can be used without it (see simulator.py)
+if TYPE_CHECKING:
+    import pygame
 
 
 def create_players(num_human: int, num_random: int, smart_players: List[int]) \
@@ -137,6 +145,164 @@ def _create_move(action: Tuple[str, Optional[int]], block: Block) -> \
     return action[0], action[1], block
 
 
+def _perform(block: Block, action: Tuple[str, Optional[int]],
+             colour: Tuple[int, int, int]) -> bool:
+    """Perform <action> on <block>, painting with <colour> if <action> is
+    PAINT.
+
+    Return True iff the action was performed successfully.
+    """
+    if action == PASS:
+        return True
+    elif action in (SMASH, COMBINE):
+        return getattr(block, action[0])()
+    elif action == PAINT:
+        return block.paint(colour)
+    else:
+        return getattr(block, action[0])(action[1])
+
+
+def _legal_moves(board: Block, colour: Tuple[int, int, int]) \
+        -> List[Tuple[Tuple[str, Optional[int]], List[int]]]:
+    """Return every move other than PASS that can be successfully performed
+    on <board> by a player whose goal colour is <colour>.
+
+    Each move is a tuple of an action and the path from <board> to the block
+    that the action is performed on.
+    """
+    moves = []
+    stack = [(board, [])]
+    while stack:
+        block, path = stack.pop()
+        if block.children:
+            moves.extend((a, path) for a in (ROTATE_CLOCKWISE,
+                                             ROTATE_COUNTER_CLOCKWISE,
+                                             SWAP_HORIZONTAL, SWAP_VERTICAL))
+            if block.combinable():
+                moves.append((COMBINE, path))
+            stack.extend((c, path + [i]) for i, c in enumerate(block.children))
+        elif block.smashable():
+            moves.append((SMASH, path))
+        elif block.level == block.max_depth and block.colour != colour:
+            moves.append((PAINT, path))
+    return moves
+
+
+def _corner(path: List[int], size: int) -> Tuple[int, int]:
+    """Return the column and row of the upper left unit cell of the block
+    reached by following <path> on a board that is <size> unit cells wide.
+    """
+    x = y = 0
+    for i in path:
+        size //= 2
+        x += size * (i in (0, 3))
+        y += size * (i in (2, 3))
+    return x, y
+
+
+def _sides(grid: List[List[Tuple[int, int, int]]], x: int, y: int,
+           size: int) -> List[List[Tuple[int, int, int]]]:
+    """Return the colours of the unit cells along the top, right, bottom and
+    left sides of the <size> by <size> square of <grid> whose upper left unit
+    cell is at column <x> and row <y>.
+
+    The top and bottom sides are read from left to right, and the left and
+    right sides from top to bottom.
+    """
+    return [[grid[x + i][y] for i in range(size)],
+            grid[x + size - 1][y:y + size],
+            [grid[x + i][y + size - 1] for i in range(size)],
+            grid[x][y:y + size]]
+
+
+def _moved_sides(grid: List[List[Tuple[int, int, int]]], x: int, y: int,
+                 size: int, action: Tuple[str, Optional[int]]) \
+        -> List[List[Tuple[int, int, int]]]:
+    """Return what the sides of the square of <grid> described in _sides
+    would be after rotating or swapping the block that fills it with
+    <action>.
+    """
+    top, right, bottom, left = _sides(grid, x, y, size)
+    half = size // 2
+    if action == ROTATE_CLOCKWISE:
+        return [left[::-1], top, right[::-1], bottom]
+    elif action == ROTATE_COUNTER_CLOCKWISE:
+        return [right, bottom[::-1], left, top[::-1]]
+    elif action == SWAP_HORIZONTAL:
+        # The columns on either side of the middle become the sides
+        return [top[half:] + top[:half], grid[x + half - 1][y:y + size],
+                bottom[half:] + bottom[:half], grid[x + half][y:y + size]]
+    return [[grid[x + i][y + half] for i in range(size)],
+            right[half:] + right[:half],
+            [grid[x + i][y + half - 1] for i in range(size)],
+            left[half:] + left[:half]]
+
+
+def _border_score(goal: Goal, sides: List[List[Tuple[int, int, int]]],
+                  outside: List[Optional[List[Tuple[int, int, int]]]]) -> int:
+    """Return how much the cells along the <sides> of a block add to the
+    score of <goal>, given the cells just <outside> each side, which are None
+    for a side on the edge of the board.
+
+    For a PerimeterGoal, these are the cells of the goal's colour on the edge
+    of the board. For a BlobGoal, they are the pairs of cells of the goal's
+    colour that touch across a side, and so join a blob inside the block to
+    one outside it.
+    """
+    score = 0
+    for inside, beyond in zip(sides, outside):
+        if beyond is None:
+            if isinstance(goal, PerimeterGoal):
+                score += inside.count(goal.colour)
+        elif isinstance(goal, BlobGoal):
+            score += sum(a == goal.colour and b == goal.colour
+                         for a, b in zip(inside, beyond))
+    return score
+
+
+def _estimate(grid: List[List[Tuple[int, int, int]]], path: List[int],
+              block: Block, action: Tuple[str, Optional[int]],
+              paint_colour: Tuple[int, int, int], goal: Goal) -> int:
+    """Return an estimate of how much doing <action> on <block>, painting with
+    <paint_colour>, would change the score of <goal>, without doing it.
+
+    <block> is reached by following <path> on the board whose unit cells are
+    in <grid>, laid out as by goal._flatten.
+
+    A paint, combine or smash is estimated by the number of unit cells of the
+    goal's colour it adds (or removes, if negative), and a smash is expected
+    to leave 1 in len(COLOUR_LIST) of its cells with each colour. Rotates and
+    swaps only move cells around inside <block>, so they are estimated by the
+    change in the cells along its sides that count towards <goal>: the cells
+    it moves onto or off the edge of the board, or the cells it joins to or
+    separates from a blob outside <block>.
+    """
+    colour = goal.colour
+    if action == PAINT:
+        return int(paint_colour == colour) - int(block.colour == colour)
+    elif action == COMBINE:
+        before = sum(child.colour == colour for child in block.children)
+        after = len(block.children) * int(block.majority_colour() == colour)
+        return after - before
+    elif action == SMASH:
+        cells = 4 ** (block.max_depth - block.level)
+        return cells // len(COLOUR_LIST) - cells * int(block.colour == colour)
+
+    width = len(grid)
+    size = width >> len(path)
+    x, y = _corner(path, width)
+    outside = [
+        [grid[x + i][y - 1] for i in range(size)] if y > 0 else None,
+        grid[x + size][y:y + size] if x + size < width else None,
+        [grid[x + i][y + size] for i in range(size)]
+        if y + size < width else None,
+        grid[x - 1][y:y + size] if x > 0 else None
+    ]
+    return _border_score(goal, _moved_sides(grid, x, y, size, action),
+                         outside) - \
+        _border_score(goal, _sides(grid, x, y, size), outside)
+
+
 class HumanPlayer(Player):
     """A human player.
     """
@@ -168,15 +334,20 @@ class HumanPlayer(Player):
 
         If no block is selected by the player, return None.
         """
+        import pygame
+
         mouse_pos = pygame.mouse.get_pos()
         block = _get_block(board, mouse_pos, self._level)
         return block
 
     def process_event(self, event: pygame.event.Event) -> None:
         """Respond to the relevant keyboard events made by the player based on
-        the mapping in KEY_ACTION, as well as the W and S keys for changing
-        the level.
+        the mapping in controls.KEY_ACTION, as well as the W and S keys for
+        changing the level.
         """
+        import pygame
+        from controls import KEY_ACTION
+
         if event.type == pygame.KEYDOWN:
             if event.key in KEY_ACTION:
                 self._desired_action = KEY_ACTION[event.key]
@@ -230,9 +401,21 @@ class RandomPlayer(Player):
         return None
 
     def process_event(self, event: pygame.event.Event) -> None:
+        import pygame
+
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             self._proceed = True
 
+    def proceed(self) -> None:
+        """Let this player make its next move, just as clicking the mouse does.
+        """
+        self._proceed = True
+
+    def ready(self) -> bool:
+        """Return True iff this player has been told to make its next move.
+        """
+        return self._proceed
+
     def _random_move(self, board: Block) \
             -> Tuple[int, Tuple[Tuple[str, Optional[int]], Block]]:
         """
@@ -245,6 +428,16 @@ class RandomPlayer(Player):
         >>> move in (SMASH, PAINT, PASS)
         True
         """
+        board_, move = self._random_candidate(board)
+        return self.goal.score(board_), move
+
+    def _random_candidate(self, board: Block) \
+            -> Tuple[Block, Tuple[Tuple[str, Optional[int]], Block]]:
+        """
+        Generates a valid random move based on <board> and returns a copy of
+        <board> with the move performed on it, and the move on a block of
+        <board>, as a tuple.
+        """
         # -F
         # There's a million ways to implement this and the way
         # I did it is honestly not great, but w/e
@@ -262,7 +455,7 @@ class RandomPlayer(Player):
             block_ = _get_block(board_, mouse_pos, level)
             block = _get_block(board, mouse_pos, level)
             # Create the list of possible moves
-            allowed = list(KEY_ACTION.values())
+            allowed = list(ACTIONS)
             # Make the choice of a random action
             action_ = random.choice(allowed)
             # This if statement should never execute, but it
@@ -270,7 +463,7 @@ class RandomPlayer(Player):
             if block_ is None or block_ != block:
                 continue
             if action_ == PASS:
-                return self.goal.score(board_), (action_, block)
+                return board_, (action_, block)
             do = getattr(block_, action_[0])
             if action_ in (SMASH, COMBINE):
                 successful = do()
@@ -278,7 +471,7 @@ class RandomPlayer(Player):
                 successful = do(self.goal.colour)
             else:
                 successful = do(action_[1])
-        return self.goal.score(board_), (action_, block)
+        return board_, (action_, block)
 
     def generate_move(self, board: Block) ->\
             Optional[Tuple[str, Optional[int], Block]]:
@@ -316,18 +509,29 @@ class SmartPlayer(RandomPlayer):
      _proceed:
        True when the player should make a move, False when the player should
        wait.
+     _batch_scorer:
+       A function that returns the score of a goal on each board in a list,
+       used to score all of the candidate moves at once (e.g.
+       batch.score_boards), or None to score each board with the goal.
     """
     _proceed: bool
     difficulty: int
+    _batch_scorer: Optional[Callable[[Goal, List[Block]], List[int]]]
 
-    def __init__(self, player_id: int, goal: Goal, difficulty: int) -> None:
+    def __init__(self, player_id: int, goal: Goal, difficulty: int,
+                 batch_scorer: Optional[
+                     Callable[[Goal, List[Block]], List[int]]] = None) \
+            -> None:
         super().__init__(player_id, goal)
         self.difficulty = difficulty
+        self._batch_scorer = batch_scorer
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         return None
 
     def process_event(self, event: pygame.event.Event) -> None:
+        import pygame
+
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             self._proceed = True
 
@@ -347,15 +551,251 @@ class SmartPlayer(RandomPlayer):
         if not self._proceed:
             return None  # Do not remove
 
-        scores = tuple(self._random_move(board) for _ in range(self.difficulty))
+        if self._batch_scorer is None:
+            scores = tuple(self._random_move(board)
+                           for _ in range(self.difficulty))
+            curr_score = self.goal.score(board)
+        else:
+            candidates = [self._random_candidate(board)
+                          for _ in range(self.difficulty)]
+            boards = [c[0] for c in candidates] + [board]
+            *batch, curr_score = self._batch_scorer(self.goal, boards)
+            scores = tuple(zip(batch, (c[1] for c in candidates)))
         score, (move, block) = max((s for s in scores), key=lambda p: p[0])
-        curr_score = self.goal.score(board)
         if score <= curr_score:
             move, block = PASS, board
         self._proceed = False  # Must set to False before returning!
         return _create_move(move, block)
 
 
+class _SearchTimeout(Exception):
+    """Raised when an AdversarialPlayer runs out of time for its turn."""
+
+
+class AdversarialPlayer(RandomPlayer):
+    """
+    A player that searches several turns ahead, modelling the goals of the
+    other players in the game.
+
+    With paranoid search, every opponent is assumed to play the move that is
+    worst for this player, which allows alpha-beta pruning. With max-n search,
+    every player is assumed to maximise its own score.
+
+    === Public Attributes ===
+    id:
+        This player's number.
+    goal:
+        This player's assigned goal for the game.
+    depth:
+        The maximum number of moves (including opponents' moves) to search.
+    breadth:
+        The number of most promising moves, including PASS, that are searched
+        at every level below the first. Moves are first ordered by a cheap
+        estimate of how they change the board, and only those that are kept
+        are made and scored.
+    time_budget:
+        The number of seconds this player may spend searching on a turn.
+    paranoid:
+        True if this player uses paranoid search, False for max-n search.
+
+     === Private Attributes ===
+     _proceed:
+       True when the player should make a move, False when the player should
+       wait.
+     _turn_order:
+       The ids and goals of all players in the order they will move, starting
+       with this player.
+     _deadline:
+       The time by which the search of the current turn must end.
+
+    === Representation Invariants ===
+    - depth >= 1
+    - breadth >= 1
+    """
+    _proceed: bool
+    depth: int
+    breadth: int
+    time_budget: float
+    paranoid: bool
+    _turn_order: List[Tuple[int, Goal]]
+    _deadline: float
+
+    def __init__(self, player_id: int, goal: Goal, depth: int = 2,
+                 breadth: int = 8, time_budget: float = 2.0,
+                 paranoid: bool = True) -> None:
+        super().__init__(player_id, goal)
+        self.depth = depth
+        self.breadth = breadth
+        self.time_budget = time_budget
+        self.paranoid = paranoid
+        self._turn_order = [(player_id, goal)]
+        self._deadline = 0.0
+
+    def observe_players(self, players: List[Player]) -> None:
+        """Record the goals of <players> and the order in which they move, so
+        that opponents can be modelled during the search.
+
+        Precondition: this player is in <players>.
+        """
+        order = [(p.id, p.goal) for p in players]
+        start = [p.id for p in players].index(self.id)
+        self._turn_order = order[start:] + order[:start]
+
+    def generate_move(self, board: Block) ->\
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return the best move found by searching up to <depth> moves ahead,
+        deepening one move at a time until <time_budget> runs out.
+
+        If no move is better than passing, this player will pass.
+
+        This function does not mutate <board>.
+        """
+        if not self._proceed:
+            return None  # Do not remove
+
+        self._deadline = time.perf_counter() + self.time_budget
+        action, path = PASS, []
+        for depth in range(1, self.depth + 1):
+            try:
+                action, path = self._search_root(board, depth)
+            except _SearchTimeout:
+                break
+
+        self._proceed = False  # Must set to False before returning!
+        return _create_move(action, get_descendant(board, path))
+
+    def _evaluate(self, board: Block, penalties: Dict[int, int]) \
+            -> Dict[int, int]:
+        """Return the score of each player that is being modelled on <board>,
+        given the penalties each has accumulated during the search.
+        """
+        if self.paranoid:
+            return {self.id: self.goal.score(board) - penalties[self.id]}
+        return {pid: goal.score(board) - penalties[pid]
+                for pid, goal in self._turn_order}
+
+    def _children(self, board: Block, mover: int,
+                  penalties: Dict[int, int], limit: Optional[int] = None) \
+            -> List[Tuple[Dict[int, int], Block, Dict[int, int],
+                          Tuple[Tuple[str, Optional[int]], List[int]]]]:
+        """Return the result of every move the player at index <mover> of the
+        turn order can make on <board>, including PASS.
+
+        Each result is a tuple of the immediate scores, the new board, the new
+        penalties and the move, and the results are ordered from the most to
+        the least promising for the mover.
+
+        If <limit> is not None, only PASS and the <limit> - 1 moves that look
+        most promising by _estimate are made and scored.
+        """
+        pid, goal = self._turn_order[mover]
+        moves = _legal_moves(board, goal.colour)
+        if limit is not None:
+            moves = self._order_moves(board, mover, moves)[:limit - 1]
+
+        results = [(self._evaluate(board, penalties), board, penalties,
+                    (PASS, []))]
+        for action, path in moves:
+            if time.perf_counter() > self._deadline:
+                raise _SearchTimeout
+            copy = board.create_copy()
+            _perform(get_descendant(copy, path), action, goal.colour)
+            new_penalties = penalties
+            if ACTION_PENALTY[action]:
+                new_penalties = dict(penalties)
+                new_penalties[pid] += ACTION_PENALTY[action]
+            results.append((self._evaluate(copy, new_penalties), copy,
+                            new_penalties, (action, path)))
+
+        if self.paranoid:
+            # Opponents are assumed to pick what hurts this player the most
+            results.sort(key=lambda r: r[0][self.id], reverse=mover == 0)
+        else:
+            results.sort(key=lambda r: r[0][pid], reverse=True)
+        return results
+
+    def _order_moves(self, board: Block, mover: int,
+                     moves: List[Tuple[Tuple[str, Optional[int]], List[int]]]) \
+            -> List[Tuple[Tuple[str, Optional[int]], List[int]]]:
+        """Return <moves>, which the player at index <mover> of the turn
+        order can make on <board>, from the most to the least promising for
+        the mover, as estimated by _estimate and the penalty of each move.
+
+        Nothing is copied or scored, so this is much cheaper than ordering
+        the moves by the scores they give.
+        """
+        goal = self._turn_order[mover][1]
+        if self.paranoid and mover != 0:
+            # Opponents are assumed to pick what hurts this player the most
+            judged, sign, pays = self.goal, -1, 0
+        else:
+            judged, sign, pays = goal, 1, 1
+        grid = _flatten(board)
+
+        def promise(move: Tuple[Tuple[str, Optional[int]], List[int]]) \
+                -> int:
+            action, path = move
+            block = get_descendant(board, path)
+            return sign * _estimate(grid, path, block, action, goal.colour,
+                                    judged) - pays * ACTION_PENALTY[action]
+
+        return sorted(moves, key=promise, reverse=True)
+
+    def _search_root(self, board: Block, depth: int) \
+            -> Tuple[Tuple[str, Optional[int]], List[int]]:
+        """Return the best move for this player on <board> when searching
+        <depth> moves ahead.
+        """
+        penalties = {pid: 0 for pid, _ in self._turn_order}
+        best_score, best_move = None, (PASS, [])
+        alpha = float('-inf')
+        for scores, child, new_penalties, move in \
+                self._children(board, 0, penalties):
+            if depth > 1:
+                scores = self._search(child, depth - 1,
+                                      1 % len(self._turn_order),
+                                      new_penalties, alpha, float('inf'))
+            # Ties are broken in favour of earlier (more promising) moves, and
+            # PASS is always first in the list
+            if best_score is None or scores[self.id] > best_score:
+                best_score, best_move = scores[self.id], move
+                alpha = max(alpha, best_score)
+        return best_move
+
+    def _search(self, board: Block, depth: int, mover: int,
+                penalties: Dict[int, int], alpha: float, beta: float) \
+            -> Dict[int, int]:
+        """Return the scores that result from searching <depth> more moves on
+        <board>, where the player at index <mover> of the turn order is the
+        next to move.
+
+        <alpha> and <beta> are the bounds on this player's score used for
+        pruning in paranoid search.
+        """
+        children = self._children(board, mover, penalties, self.breadth)
+        pid = self._turn_order[mover][0]
+        following = (mover + 1) % len(self._turn_order)
+        best = None
+        for scores, child, new_penalties, _ in children:
+            if depth > 1:
+                scores = self._search(child, depth - 1, following,
+                                      new_penalties, alpha, beta)
+            if not self.paranoid:
+                if best is None or scores[pid] > best[pid]:
+                    best = scores
+            elif mover == 0:
+                if best is None or scores[self.id] > best[self.id]:
+                    best = scores
+                alpha = max(alpha, best[self.id])
+            else:
+                if best is None or scores[self.id] < best[self.id]:
+                    best = scores
+                beta = min(beta, best[self.id])
+            if self.paranoid and alpha >= beta:
+                break
+        return best
+
+
 if __name__ == '__main__':
     import python_ta
 
@@ -363,7 +803,7 @@ if __name__ == '__main__':
         'allowed-io': ['process_event'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'actions', 'block',
-            'goal', 'pygame', '__future__'
+            'goal', 'pygame', '__future__', 'time', 'controls', 'settings'
         ],
         'max-attributes': 10,
         'generated-members': 'pygame.*'
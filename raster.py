@@ -0,0 +1,217 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a renderer that draws boards into a NumPy array of pixels
+instead of onto the screen, for making thumbnails and videos of games without
+a display.
+
+Pixels are stored in an array of shape (height, width, 3), one row of RGB
+values after another, which is the layout expected by most image encoders and
+by pygame.image.frombuffer. Squares are drawn exactly as Renderer.draw_board
+draws them, so the pixels match a screenshot of the board.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import os
+
+import numpy as np
+
+from actions import ACTION_IMAGE
+from block import Block
+from settings import BACKGROUND_COLOUR, OUTLINE_COLOUR, OUTLINE_THICKNESS, \
+    HIGHLIGHT_COLOUR, HIGHLIGHT_THICKNESS
+
+if TYPE_CHECKING:
+    import pygame
+
+
+class PixelRenderer:
+    """Draws boards into an array of pixels.
+
+    === Public Attributes ===
+    pixels:
+        The drawn pixels, in an array of shape (height, width, 3).
+    """
+    # === Private Attributes ===
+    # _ids:
+    #   For each pixel, the index of the square that was last drawn on it in
+    #   the squares given to draw_board, or -1 if no square covers it.
+    # _rows:
+    #   The row of each pixel, in an array of shape (height, 1).
+    # _columns:
+    #   The column of each pixel, in an array of shape (1, width).
+    # _images:
+    #   Maps an action and a size to the image of the action scaled to that
+    #   size, as an array of shape (size, size, 4) of RGBA values.
+    pixels: np.ndarray
+    _ids: np.ndarray
+    _rows: np.ndarray
+    _columns: np.ndarray
+    _images: Dict[Tuple[Tuple[str, Optional[int]], int], np.ndarray]
+
+    def __init__(self, width: int, height: Optional[int] = None) -> None:
+        """Initialize this PixelRenderer with <width> by <height> pixels of
+        BACKGROUND_COLOUR. If <height> is None, it is the same as <width>.
+        """
+        if height is None:
+            height = width
+        self.pixels = np.empty((height, width, 3), dtype=np.uint8)
+        self._ids = np.empty((height, width), dtype=np.int32)
+        self._rows = np.arange(height).reshape(height, 1)
+        self._columns = np.arange(width).reshape(1, width)
+        self._images = {}
+        self.clear()
+
+    def clear(self) -> None:
+        """Fill every pixel with BACKGROUND_COLOUR.
+        """
+        self.pixels[:] = BACKGROUND_COLOUR
+
+    def draw_board(self, squares: List[Tuple[Tuple[int, int, int],
+                                             Tuple[int, int], int]]) -> None:
+        """Draw each square in <squares>, as returned by
+        blocky._block_to_squares, with an outline of OUTLINE_COLOUR.
+
+        Each square is filled with a single slice assignment, while recording
+        which square covers each pixel. The outlines of every square are then
+        found at once, as the pixels that lie within OUTLINE_THICKNESS of an
+        edge of the square that covers them.
+        """
+        if not squares:
+            return
+        pixels = self.pixels
+        ids = self._ids
+        ids.fill(-1)
+        for i, (colour, (x, y), size) in enumerate(squares):
+            pixels[y:y + size, x:x + size] = colour
+            ids[y:y + size, x:x + size] = i
+
+        left = np.array([pos[0] for _, pos, _ in squares])
+        top = np.array([pos[1] for _, pos, _ in squares])
+        sizes = np.array([size for _, _, size in squares])
+        covered = ids >= 0
+        square = np.where(covered, ids, 0)
+        dx = self._columns - left[square]
+        dy = self._rows - top[square]
+        inner = sizes[square] - OUTLINE_THICKNESS
+        outline = covered & ((dx < OUTLINE_THICKNESS) | (dx >= inner) |
+                             (dy < OUTLINE_THICKNESS) | (dy >= inner))
+        pixels[outline] = OUTLINE_COLOUR
+
+    def highlight_block(self, pos: Tuple[int, int], size: int) -> None:
+        """Draw a highlighted square border at pos with size.
+        """
+        x, y = pos
+        t = HIGHLIGHT_THICKNESS
+        pixels = self.pixels
+        pixels[y:y + t, x:x + size] = HIGHLIGHT_COLOUR
+        pixels[y + size - t:y + size, x:x + size] = HIGHLIGHT_COLOUR
+        pixels[y:y + size, x:x + t] = HIGHLIGHT_COLOUR
+        pixels[y:y + size, x + size - t:x + size] = HIGHLIGHT_COLOUR
+
+    def draw_image(self, action: Tuple[str, Optional[int]],
+                   pos: Tuple[int, int], size: int) -> None:
+        """Draw the image that coincides with action at pos, stretched to fit
+        size, blending it with the pixels behind it.
+
+        If the action is not supported, no image is drawn.
+        """
+        if action not in ACTION_IMAGE:
+            return
+        key = (action, size)
+        if key not in self._images:
+            self._images[key] = _load_rgba(ACTION_IMAGE[action], size)
+        image = self._images[key]
+
+        x, y = pos
+        region = self.pixels[y:y + size, x:x + size]
+        image = image[:region.shape[0], :region.shape[1]]
+        alpha = image[:, :, 3:].astype(np.uint16)
+        blended = (image[:, :, :3] * alpha +
+                   region * (255 - alpha) + 127) // 255
+        region[:] = blended
+
+    def to_surface(self) -> pygame.Surface:
+        """Return a pygame Surface that shares its pixels with self.pixels,
+        without copying them.
+
+        The Surface shows any later changes to self.pixels.
+        """
+        import pygame
+
+        height, width, _ = self.pixels.shape
+        return pygame.image.frombuffer(self.pixels, (width, height), 'RGB')
+
+
+def _load_rgba(path: str, size: int) -> np.ndarray:
+    """Return the image at <path>, relative to this file, scaled to <size> by
+    <size>, as an array of shape (size, size, 4) of RGBA values.
+    """
+    import pygame
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    image = pygame.image.load(os.path.join(here, path))
+    image = pygame.transform.scale(image, (size, size))
+    return np.frombuffer(pygame.image.tobytes(image, 'RGBA'),
+                         dtype=np.uint8).reshape(size, size, 4)
+
+
+def board_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
+                                              Tuple[int, int], int]]:
+    """Return the squares to draw for <board>, relative to its upper left
+    corner.
+
+    The squares are listed in the same order as blocky._block_to_squares,
+    which is not used here so that pygame is not needed.
+    """
+    squares = []
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if block.children:
+            stack.extend(reversed(block.children))
+        else:
+            x, y = block.position
+            squares.append((block.colour, (x - board.position[0],
+                                           y - board.position[1]),
+                            block.size))
+    return squares
+
+
+def rasterise(board: Block) -> np.ndarray:
+    """Return the pixels of <board> drawn from its upper left corner, in an
+    array of shape (board.size, board.size, 3).
+    """
+    renderer = PixelRenderer(board.size)
+    renderer.draw_board(board_squares(board))
+    return renderer.pixels
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'os', 'numpy',
+            'pygame', 'actions', 'block', 'settings'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -22,26 +22,31 @@ Misha Schwartz, and Jaisie Sin.
 This file contains the class that "renders" the image of our game.
 """
 from typing import Dict, List, Tuple, Optional
+import os
 import pygame
 
-from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,\
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, ACTION_KEY, ACTION_LABEL, COMBINE,\
-    PAINT, PASS
+from actions import ACTION_IMAGE, ACTION_LABEL
+from block import level_sizes
+from controls import ACTION_KEY, UNDO_KEY, REDO_KEY
 from settings import BACKGROUND_COLOUR, TEXT_COLOUR, OUTLINE_THICKNESS, \
     OUTLINE_COLOUR, HIGHLIGHT_THICKNESS, HIGHLIGHT_COLOUR, COLOUR_LIST, \
     colour_name
 
 Y_FONT_PADDING = 2
 
+# The most rendered pieces of text that a Renderer keeps
+TEXT_CACHE_SIZE = 256
+
 
 def _load_image(path_to_file: str) -> pygame.Surface:
     """
-    Load an image from <path_to_file>.
+    Load an image from <path_to_file>, relative to the directory of this file.
 
     If an error occurs, print it before exiting the program.
     """
+    here = os.path.dirname(os.path.abspath(__file__))
     try:
-        image = pygame.image.load(path_to_file)
+        image = pygame.image.load(os.path.join(here, path_to_file))
     except pygame.error as e:
         # Avoid outputting the stack trace, just show the error
         print('ERROR: ', e)
@@ -75,6 +80,12 @@ def _print_human_instructions(x: int, y: int, text_height: int,
     text = 'Decrease Level: W'
     _print_to_image(text, x, y, font, image)
     y += text_height + Y_FONT_PADDING
+    text = f'Undo: {pygame.key.name(UNDO_KEY).upper()}'
+    _print_to_image(text, x, y, font, image)
+    y += text_height + Y_FONT_PADDING
+    text = f'Redo: {pygame.key.name(REDO_KEY).upper()}'
+    _print_to_image(text, x, y, font, image)
+    y += text_height + Y_FONT_PADDING
 
     for action, key in ACTION_KEY.items():
         key_name = pygame.key.name(key).upper()
@@ -118,11 +129,14 @@ def _print_colours(x: int, y: int, text_height: int,
     return y
 
 
-def _print_instructions(screen: pygame.Surface,
-                        font: pygame.font.Font, height: int) -> \
+def _print_instructions(font: pygame.font.Font, width: int, height: int) -> \
         pygame.Surface:
+    """Return a new <width> by <height> image of the instructions, printed
+    with <font>.
+    """
     text_height = font.size("Test")[1]
-    image = screen.subsurface(((750, 0), (250, height)))
+    image = pygame.Surface((width, height))
+    image.fill(BACKGROUND_COLOUR)
 
     # Setup the initial position
     x_pos = 10
@@ -148,19 +162,72 @@ class Renderer:
     #   The pygame image to draw on for visualizing graphics.
     # _font:
     #   The font to use for text being drawn.
+    # _instructions:
+    #   The image of the instructions, which is drawn beside the board.
     # _images:
     #   A dictionary mapping actions to images that are displayed in the game.
+    #   If images are loaded lazily, an image is only added when it is first
+    #   drawn.
+    # _scaled_images:
+    #   A dictionary mapping an action and a size to the image of the action,
+    #   scaled to that size.
+    # _texts:
+    #   A dictionary mapping a piece of text and a colour to the text rendered
+    #   in that colour, holding at most TEXT_CACHE_SIZE of the most recently
+    #   rendered pieces of text.
+    # _status_message:
+    #   The status message shown on the screen, or None if there is none.
     # _status_position:
     #   The (x, y) position of the status messages.
+    # _status_rect:
+    #   The area of the screen that status messages are drawn in.
+    # _clear_rect:
+    #   The area of the screen that clear fills.
+    # _board:
+    #   The board as it was last drawn, without anything drawn on top of it.
+    # _board_rect:
+    #   The area of the screen that the board is drawn in.
+    # _drawn:
+    #   Maps the position and size of every square drawn on _board to its
+    #   colour.
+    # _last_squares:
+    #   The squares that _board was last drawn from.
+    # _board_on_screen:
+    #   Whether the screen shows _board, apart from the areas in _overlays.
+    # _overlays:
+    #   The areas of the board that have been drawn over on the screen since
+    #   the board was last drawn.
+    # _dirty:
+    #   The areas of the screen that have changed since the last call to
+    #   present.
     _screen: pygame.Surface
     _instructions: pygame.Surface
     _images: Dict[Tuple[str, Optional[int]], pygame.Surface]
+    _scaled_images: Dict[Tuple[Tuple[str, Optional[int]], int],
+                         pygame.Surface]
     _font: pygame.font.Font
+    _texts: Dict[Tuple[str, Tuple[int, int, int]], pygame.Surface]
+    _status_message: Optional[str]
     _status_position: Tuple[int, int]
+    _status_rect: pygame.Rect
     _clear_rect: Tuple[Tuple[int, int], Tuple[int, int]]
-
-    def __init__(self, size: int) -> None:
+    _board: pygame.Surface
+    _board_rect: pygame.Rect
+    _drawn: Dict[Tuple[Tuple[int, int], int], Tuple[int, int, int]]
+    _last_squares: Optional[List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                       int]]]
+    _board_on_screen: bool
+    _overlays: List[pygame.Rect]
+    _dirty: List[pygame.Rect]
+
+    def __init__(self, size: int, max_depth: Optional[int] = None,
+                 lazy_images: bool = False) -> None:
         """Initialize this Renderer for a board with dimensions <size> x <size>.
+
+        If <max_depth> is not None, the images of every action are scaled
+        ahead of time to the size of a Block at every level up to <max_depth>.
+        If <lazy_images> is True, each image is instead only loaded and scaled
+        when it is first drawn.
         """
         self._font = pygame.font.Font(pygame.font.get_default_font(), 14)
         status_height = self._font.size("Player")[1]
@@ -170,27 +237,60 @@ class Renderer:
         width = size + instructions_width
 
         self._screen = pygame.display.set_mode((width, height))
-        self._instructions = _print_instructions(self._screen, self._font,
-                                                 height)
+        self._instructions = _print_instructions(self._font,
+                                                 instructions_width, height)
+        self._screen.blit(self._instructions, (size, 0))
 
+        self._texts = {}
+        self._status_message = None
         self._status_position = (10, size + Y_FONT_PADDING)
+        self._status_rect = pygame.Rect(0, size, size, height - size)
         self._clear_rect = ((0, 0), (size, height))
 
-        self._images = {
-            ROTATE_CLOCKWISE: _load_image('images/rotate-cw.png'),
-            ROTATE_COUNTER_CLOCKWISE: _load_image('images/rotate-ccw.png'),
-            SWAP_HORIZONTAL: _load_image('images/swap-horizontal.png'),
-            SWAP_VERTICAL: _load_image('images/swap-vertical.png'),
-            SMASH: _load_image('images/smash.png'),
-            COMBINE: _load_image('images/combine.png'),
-            PAINT: _load_image('images/paint.png'),
-            PASS: _load_image('images/pass.png')
-        }
+        self._board = pygame.Surface((size, size))
+        self._board_rect = pygame.Rect(0, 0, size, size)
+        self._drawn = {}
+        self._last_squares = None
+        self._board_on_screen = False
+        self._overlays = []
+        self._dirty = [self._screen.get_rect()]
+
+        self._images = {}
+        self._scaled_images = {}
+        if not lazy_images:
+            for action, path in ACTION_IMAGE.items():
+                self._images[action] = _load_image(path)
+        if max_depth is not None and not lazy_images:
+            for block_size in level_sizes(size, max_depth):
+                for action in self._images:
+                    self._scaled_image(action, block_size)
 
     def clear(self) -> None:
         """Clear the screen with BACKGROUND_COLOUR.
         """
         self._screen.fill(BACKGROUND_COLOUR, self._clear_rect)
+        self._dirty.append(pygame.Rect(self._clear_rect))
+        self._board_on_screen = False
+        self._overlays = []
+        self._status_message = None
+
+    def present(self) -> bool:
+        """Push the areas of the screen that have changed since the last call
+        to present to the display.
+
+        Return True iff anything changed.
+        """
+        if not self._dirty:
+            return False
+        pygame.display.update(self._dirty)
+        self._dirty = []
+        return True
+
+    def _draw_over(self, rect: pygame.Rect) -> None:
+        """Record that <rect> on the screen has been drawn on top of the board.
+        """
+        self._overlays.append(rect)
+        self._dirty.append(rect)
 
     def draw_image(self, action: Tuple[str, Optional[int]],
                    pos: Tuple[int, int], size: int) -> None:
@@ -199,27 +299,60 @@ class Renderer:
 
         If the action is not supported, no image is drawn.
         """
-        if action in self._images:
-            image = self._images[action]
-            image = pygame.transform.scale(image, (size, size))
-            self._screen.blit(image, pos)
+        if action in ACTION_IMAGE:
+            image = self._scaled_image(action, size)
+            self._draw_over(self._screen.blit(image, pos))
+
+    def _scaled_image(self, action: Tuple[str, Optional[int]], size: int) \
+            -> pygame.Surface:
+        """Return the image of <action> scaled to <size> by <size>, scaling it
+        only the first time it is needed at that size.
+        """
+        key = (action, size)
+        if key not in self._scaled_images:
+            if action not in self._images:
+                self._images[action] = _load_image(ACTION_IMAGE[action])
+            image = pygame.transform.scale(self._images[action], (size, size))
+            self._scaled_images[key] = image.convert_alpha()
+        return self._scaled_images[key]
 
     def draw_board(self, squares: List[Tuple[Tuple[int, int, int],
                                              Tuple[int, int], int]]) -> None:
         """Draw each block in blocks onto the screen.
+
+        The board is kept between calls, so only the squares that differ from
+        the last call are drawn again. Anything drawn on top of the board since
+        then is erased.
         """
-        for colour, pos, size in squares:
-            rect = (pos[0], pos[1], size, size)
-            pygame.draw.rect(self._screen, colour, rect, 0)
-            pygame.draw.rect(self._screen, OUTLINE_COLOUR, rect,
-                             OUTLINE_THICKNESS)
+        changed = []
+        if squares is not self._last_squares:
+            drawn = {}
+            for colour, pos, size in squares:
+                drawn[(pos, size)] = colour
+                if self._drawn.get((pos, size)) != colour:
+                    rect = pygame.Rect(pos[0], pos[1], size, size)
+                    pygame.draw.rect(self._board, colour, rect, 0)
+                    pygame.draw.rect(self._board, OUTLINE_COLOUR, rect,
+                                     OUTLINE_THICKNESS)
+                    changed.append(rect)
+            self._drawn = drawn
+            self._last_squares = squares
+
+        if not self._board_on_screen:
+            changed = [self._board_rect]
+            self._board_on_screen = True
+        for rect in changed + self._overlays:
+            self._screen.blit(self._board, rect, rect)
+            self._dirty.append(rect)
+        self._overlays = []
 
     def highlight_block(self, pos: Tuple[int, int], size: int) -> None:
         """Draw a highlighted square border at pos with size.
         """
-        rect = (pos[0], pos[1], size, size)
+        rect = pygame.Rect(pos[0], pos[1], size, size)
         pygame.draw.rect(self._screen, HIGHLIGHT_COLOUR, rect,
                          HIGHLIGHT_THICKNESS)
+        self._draw_over(rect)
 
     def text_height(self) -> int:
         """Return the height between lines of text in pixels.
@@ -229,13 +362,37 @@ class Renderer:
     def print(self, text: str, x: int, y: int) -> None:
         """Print <text> to the (<x>, <y>) location on the screen.
         """
-        _print_to_image(text, x, y, self._font, self._screen)
+        surface = self._render_text(text, TEXT_COLOUR)
+        self._draw_over(self._screen.blit(surface, (x, y)))
 
     def draw_status(self, message: str) -> None:
         """Draw the current status of the game.
+
+        Nothing is drawn if <message> is already shown.
         """
-        surface = self._font.render(message, 1, TEXT_COLOUR)
+        if message == self._status_message:
+            return
+        self._status_message = message
+        self._screen.fill(BACKGROUND_COLOUR, self._status_rect)
+        surface = self._render_text(message, TEXT_COLOUR)
         self._screen.blit(surface, self._status_position)
+        self._dirty.append(self._status_rect)
+
+    def _render_text(self, text: str, colour: Tuple[int, int, int]) \
+            -> pygame.Surface:
+        """Return <text> rendered in <colour>, rendering it only if it has not
+        been rendered recently.
+        """
+        key = (text, colour)
+        if key in self._texts:
+            # Move the text to the end, as the most recently used
+            surface = self._texts.pop(key)
+        else:
+            surface = self._font.render(text, 1, colour)
+            if len(self._texts) >= TEXT_CACHE_SIZE:
+                del self._texts[next(iter(self._texts))]
+        self._texts[key] = surface
+        return surface
 
     def save_to_file(self, filename: str) -> None:
         """Save the current graphics on the screen to a file named <filename>.
@@ -0,0 +1,368 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a compact binary log of the moves made in a game, and a
+Replay class that rebuilds the board at any point of a logged game without
+rendering it.
+
+The log starts with a header describing the game:
+    - the magic bytes b'BLKY' and a format version,
+    - the seed the board was generated with,
+    - the max_depth and size of the board,
+    - the index in COLOUR_LIST of each player's goal colour.
+
+Every successful move is then stored as:
+    - 1 byte: the ID of the player who made the move,
+    - 1 byte: the index of the action in ACTIONS (high 4 bits) and the length
+      of the path to the block (low 4 bits),
+    - the path from the board to the block, 2 bits per level,
+    - for smashes only, the 4-byte seed that the new children were generated
+      with.
+
+Blocks are identified by their path from the board, rather than by reference,
+so that a move can be applied to any copy of the board.
+"""
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+import random
+import struct
+
+from actions import ACTIONS, SMASH, ROTATE_CLOCKWISE, \
+    ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL, SWAP_VERTICAL
+from block import Block, generate_board
+from player import _perform
+from settings import COLOUR_LIST
+
+_MAGIC = b'BLKY'
+_VERSION = 1
+_HEADER = struct.Struct('>4sBIBHB')
+_SEED = struct.Struct('>I')
+
+# A logged move: the player ID, the action, the path to the block, and the
+# seed of the smash (or None if the move is not a smash)
+LoggedMove = Tuple[int, Tuple[str, Optional[int]], List[int], Optional[int]]
+
+
+def _pack_path(path: List[int]) -> bytes:
+    """Return <path> packed into bytes, 2 bits per level, first level in the
+    highest bits.
+
+    >>> _pack_path([3, 0, 1, 2, 1])
+    b'\\xc6@'
+    """
+    packed = bytearray((len(path) + 3) // 4)
+    for i, child in enumerate(path):
+        packed[i // 4] |= child << (6 - 2 * (i % 4))
+    return bytes(packed)
+
+
+class MoveLog:
+    """A compact binary record of every successful move in a game.
+
+    === Public Attributes ===
+    seed:
+        The seed of the random module when the board was generated.
+    max_depth:
+        The max_depth of the board.
+    size:
+        The size of the board.
+    colours:
+        The goal colour of each player, in order of player ID.
+    """
+    # === Private Attributes ===
+    # _data:
+    #   The encoded moves, without the header.
+    # _offsets:
+    #   The index in _data at which each move starts.
+    seed: int
+    max_depth: int
+    size: int
+    colours: List[Tuple[int, int, int]]
+    _data: bytearray
+    _offsets: List[int]
+
+    def __init__(self, seed: int, max_depth: int, size: int,
+                 colours: List[Tuple[int, int, int]]) -> None:
+        """Initialize an empty log for a game whose board was generated by
+        generate_board(<max_depth>, <size>) with a random generator seeded
+        with <seed>, and whose players' goals have <colours>.
+        """
+        self.seed = seed
+        self.max_depth = max_depth
+        self.size = size
+        self.colours = colours
+        self._data = bytearray()
+        self._offsets = []
+
+    def __len__(self) -> int:
+        """Return the number of moves in this log.
+        """
+        return len(self._offsets)
+
+    def append(self, player_id: int, action: Tuple[str, Optional[int]],
+               path: List[int], smash_seed: Optional[int] = None) -> None:
+        """Add the move of <action> by <player_id> on the block at <path> to
+        this log.
+
+        Precondition: <smash_seed> is not None iff <action> is SMASH
+        """
+        self._offsets.append(len(self._data))
+        self._data.append(player_id)
+        self._data.append(ACTIONS.index(action) << 4 | len(path))
+        self._data += _pack_path(path)
+        if smash_seed is not None:
+            self._data += _SEED.pack(smash_seed)
+
+    def entry(self, index: int) -> bytes:
+        """Return the encoded move at <index> of this log.
+        """
+        end = self._offsets[index + 1] if index + 1 < len(self._offsets) \
+            else len(self._data)
+        return bytes(self._data[self._offsets[index]:end])
+
+    def append_entry(self, entry: bytes) -> None:
+        """Add a move that was encoded by this or another log to this log.
+        """
+        self._offsets.append(len(self._data))
+        self._data += entry
+
+    def truncate(self, count: int) -> None:
+        """Remove every move after the first <count> moves from this log.
+        """
+        if count < len(self._offsets):
+            del self._data[self._offsets[count]:]
+            del self._offsets[count:]
+
+    def moves(self) -> Iterator[LoggedMove]:
+        """Yield each move in this log, in the order they were made.
+        """
+        for i in range(len(self._offsets)):
+            yield self.move(i)
+
+    def move(self, index: int) -> LoggedMove:
+        """Return the move at <index> of this log.
+        """
+        data = self._data
+        i = self._offsets[index]
+        player_id = data[i]
+        action = ACTIONS[data[i + 1] >> 4]
+        length = data[i + 1] & 0xF
+        i += 2
+        path = [(data[i + j // 4] >> (6 - 2 * (j % 4))) & 3
+                for j in range(length)]
+        i += (length + 3) // 4
+        smash_seed = None
+        if action == SMASH:
+            smash_seed = _SEED.unpack_from(data, i)[0]
+        return player_id, action, path, smash_seed
+
+    def to_bytes(self) -> bytes:
+        """Return this log, including its header, as bytes.
+        """
+        header = _HEADER.pack(_MAGIC, _VERSION, self.seed, self.max_depth,
+                              self.size, len(self.colours))
+        colours = bytes(COLOUR_LIST.index(c) for c in self.colours)
+        return header + colours + _SEED.pack(len(self)) + bytes(self._data)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> MoveLog:
+        """Return the log that was encoded as <data> by to_bytes.
+        """
+        magic, version, seed, max_depth, size, num_players = \
+            _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Not a Blocky move log')
+        start = _HEADER.size
+        colours = [COLOUR_LIST[i] for i in data[start:start + num_players]]
+        start += num_players
+
+        log = MoveLog(seed, max_depth, size, colours)
+        count = _SEED.unpack_from(data, start)[0]
+        log._data = bytearray(data[start + _SEED.size:])
+        i = 0
+        for _ in range(count):
+            log._offsets.append(i)
+            action = ACTIONS[log._data[i + 1] >> 4]
+            length = log._data[i + 1] & 0xF
+            i += 2 + (length + 3) // 4
+            if action == SMASH:
+                i += _SEED.size
+        return log
+
+
+class _Rotations:
+    """The rotations of a board that have not yet been passed down to every
+    Block below the rotated ones.
+
+    Rotating a Block reorders the children of every Block below it. To save
+    that work, a rotation is only recorded as pending on the rotated Block,
+    and is passed down one level at a time, when a later move reaches below
+    it, or when every pending rotation is settled.
+    """
+    # === Private Attributes ===
+    # _pending:
+    #   Maps the id of a Block to the Block and the number of quarter turns
+    #   that its children, and every Block below them, must still be rotated
+    #   by. The Block is kept so that its id is not reused.
+    _pending: Dict[int, Tuple[Block, int]]
+
+    def __init__(self) -> None:
+        self._pending = {}
+
+    def rotate(self, block: Block, direction: int) -> None:
+        """Record that <block> was rotated in <direction>, as in Block.rotate.
+        """
+        if not block.children:
+            return
+        _, turns = self._pending.get(id(block), (block, 0))
+        turns = (turns + direction) % 4
+        if turns:
+            self._pending[id(block)] = (block, turns)
+        else:
+            del self._pending[id(block)]
+
+    def settle(self, block: Block) -> None:
+        """Reorder the children of <block> by its pending rotation, and pass
+        the rotation on to its children.
+        """
+        entry = self._pending.pop(id(block), None)
+        if entry is None:
+            return
+        turns = entry[1]
+        c = block.children
+        block.children = [c[turns], c[(1 + turns) % 4], c[(2 + turns) % 4],
+                          c[(3 + turns) % 4]]
+        for child in block.children:
+            self.rotate(child, turns)
+
+    def descend(self, board: Block, path: List[int]) -> Block:
+        """Return the Block reached by following <path> from <board>, settling
+        the rotation of every Block above it on the way.
+        """
+        node = board
+        for i in path:
+            self.settle(node)
+            node = node.children[i]
+        return node
+
+    def settle_all(self, board: Block) -> None:
+        """Settle every pending rotation in <board>.
+        """
+        stack = [board]
+        while stack and self._pending:
+            block = stack.pop()
+            self.settle(block)
+            stack.extend(c for c in block.children if c.children)
+
+
+class Replay:
+    """Rebuilds the board of a logged game after any number of moves.
+
+    Copies of the board are kept every <snapshot_interval> moves as they are
+    reached, so that later requests can fast-forward from the nearest one
+    instead of from the start of the game. The positions of the Blocks in
+    these copies may be out of date.
+
+    Moves are replayed without updating positions or rotating whole
+    subtrees, which is done once for the board that is returned.
+    """
+    # === Private Attributes ===
+    # _log:
+    #   The log of the game being replayed.
+    # _moves:
+    #   The decoded moves of the log.
+    # _snapshot_interval:
+    #   The number of moves between snapshots.
+    # _snapshots:
+    #   Maps a number of moves to a copy of the board after that many moves.
+    _log: MoveLog
+    _moves: List[LoggedMove]
+    _snapshot_interval: int
+    _snapshots: Dict[int, Block]
+
+    def __init__(self, log: MoveLog, snapshot_interval: int = 1000) -> None:
+        """Initialize a replay of the game recorded in <log>.
+
+        Precondition: snapshot_interval >= 1
+        """
+        self._log = log
+        self._moves = list(log.moves())
+        self._snapshot_interval = snapshot_interval
+
+        self._snapshots = {0: generate_board(log.max_depth, log.size,
+                                             random.Random(log.seed))}
+
+    def __len__(self) -> int:
+        """Return the number of moves in the replayed game.
+        """
+        return len(self._moves)
+
+    def turn_start(self, turn: int) -> int:
+        """Return the number of moves made before <turn> starts.
+        """
+        return turn * len(self._log.colours)
+
+    def board_after(self, num_moves: int) -> Block:
+        """Return a new board that is the same as the game's board after the
+        first <num_moves> moves.
+
+        Precondition: 0 <= num_moves <= len(self)
+        """
+        start = num_moves - num_moves % self._snapshot_interval
+        while start not in self._snapshots:
+            start -= self._snapshot_interval
+        board = self._snapshots[start].create_copy()
+
+        # Positions only matter once the board is returned, so they are
+        # updated once at the end, instead of after every rotate and swap
+        colours = self._log.colours
+        rotations = _Rotations()
+        for i in range(start, num_moves):
+            player_id, action, path, smash_seed = self._moves[i]
+            block = rotations.descend(board, path)
+            if action in (ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE):
+                rotations.rotate(block, action[1])
+            else:
+                rotations.settle(block)
+                if action == SMASH:
+                    block.smash(random.Random(smash_seed))
+                elif action in (SWAP_HORIZONTAL, SWAP_VERTICAL):
+                    if block.children:
+                        block.swap_children(action[1])
+                else:
+                    _perform(block, action, colours[player_id])
+            if (i + 1) % self._snapshot_interval == 0:
+                rotations.settle_all(board)
+                self._snapshots[i + 1] = board.create_copy()
+        rotations.settle_all(board)
+        board.update_positions()
+        return board
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'struct',
+            'actions', 'block', 'player', 'settings'
+        ]
+    })
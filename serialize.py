@@ -0,0 +1,131 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains functions that convert a Block to and from a compact
+binary format, for saving boards to disk or sending them to other processes.
+
+The encoding starts with a header holding the position, size, level and
+max_depth of the Block and the number of bits used for each colour. The
+Block's tree then follows in preorder, using one bit per Block (1 for a Block
+with children, 0 for a leaf) followed, for leaves only, by the index of the
+leaf's colour in COLOUR_LIST. With the four colours of COLOUR_LIST, that is
+2 bits per colour.
+"""
+from __future__ import annotations
+from typing import List
+import struct
+
+from block import Block
+from settings import COLOUR_LIST
+
+_HEADER = struct.Struct('>HHHBBB')
+
+# The number of bits needed to store the index of a colour in COLOUR_LIST
+COLOUR_BITS = max(1, (len(COLOUR_LIST) - 1).bit_length())
+
+_COLOUR_CODE = {colour: format(i, f'0{COLOUR_BITS}b')
+                for i, colour in enumerate(COLOUR_LIST)}
+_CODE_COLOUR = {code: colour for colour, code in _COLOUR_CODE.items()}
+
+
+def encode_board(block: Block) -> bytes:
+    """Return <block> and all of its descendants encoded as bytes.
+
+    Raise a ValueError if a leaf has a colour that is not in COLOUR_LIST.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[1], 0, 2)
+    >>> len(encode_board(board))
+    10
+    """
+    bits: List[str] = []
+    stack = [block]
+    while stack:
+        b = stack.pop()
+        if b.children:
+            bits.append('1')
+            stack.extend(reversed(b.children))
+        elif b.colour in _COLOUR_CODE:
+            bits.append('0')
+            bits.append(_COLOUR_CODE[b.colour])
+        else:
+            raise ValueError(f'Cannot encode the colour {b.colour}')
+
+    stream = ''.join(bits)
+    # Pad the stream to a whole number of bytes
+    stream += '0' * (-len(stream) % 8)
+    header = _HEADER.pack(block.position[0], block.position[1], block.size,
+                          block.level, block.max_depth, COLOUR_BITS)
+    return header + int(stream, 2).to_bytes(len(stream) // 8, 'big')
+
+
+def decode_board(data: bytes) -> Block:
+    """Return the Block that was encoded as <data> by encode_board.
+
+    >>> board = Block((0, 0), 750, None, 0, 1)
+    >>> board.children = [Block(pos, 375, c, 1, 1) for pos, c in
+    ...                   zip(board._children_positions(), COLOUR_LIST)]
+    >>> decode_board(encode_board(board)) == board
+    True
+    """
+    x, y, size, level, max_depth, colour_bits = _HEADER.unpack_from(data)
+    if colour_bits != COLOUR_BITS:
+        raise ValueError('The board was encoded with a different palette')
+    body = data[_HEADER.size:]
+    stream = format(int.from_bytes(body, 'big'), f'0{8 * len(body)}b')
+
+    root = Block((x, y), size, None, level, max_depth)
+    if stream[0] == '0':
+        root.colour = _CODE_COLOUR[stream[1:1 + COLOUR_BITS]]
+    else:
+        _decode_children(root, stream, 1)
+    return root
+
+
+def _decode_children(block: Block, stream: str, i: int) -> int:
+    """Give <block> the four children encoded in <stream> starting at index
+    <i>, along with all of their descendants.
+
+    Return the index in <stream> just after the last descendant.
+    """
+    size = block._child_size()
+    level = block.level + 1
+    children = []
+    for pos in block._children_positions():
+        child = Block(pos, size, None, level, block.max_depth)
+        if stream[i] == '1':
+            i = _decode_children(child, stream, i + 1)
+        else:
+            child.colour = _CODE_COLOUR[stream[i + 1:i + 1 + COLOUR_BITS]]
+            i += 1 + COLOUR_BITS
+        children.append(child)
+    block.children = children
+    return i
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'struct', 'block',
+            'settings'
+        ]
+    })
@@ -0,0 +1,189 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains the Simulator class, which plays games of Blocky between
+computer players without a screen.
+
+Nothing here imports pygame: there is no event loop and no frame rate, so a
+game runs as fast as its players can generate moves.
+"""
+from __future__ import annotations
+from typing import List, Optional, Tuple
+import random
+import time
+
+from block import Block, generate_board
+from game_data import GameData
+from player import Player, RandomPlayer, create_players
+from replay import MoveLog
+from settings import BOARD_SIZE
+from telemetry import turn_record
+
+
+class Simulator:
+    """A game of Blocky between computer players, played without a screen.
+
+    === Public Attributes ===
+    data:
+        The data of the game being played.
+    last_move:
+        The last move that was done, or None if no move has been done yet.
+    """
+    # === Private Attributes ===
+    # _turn:
+    #   The current turn.
+    # _current_player_index:
+    #   The index of the current player in data.players.
+    data: GameData
+    last_move: Optional[Tuple[str, Optional[int], Block]]
+    _turn: int
+    _current_player_index: int
+
+    def __init__(self, data: GameData, num_turns: int) -> None:
+        """Initialize a game on <data> that will stop after <num_turns>.
+
+        Raise a ValueError if any of the players is a HumanPlayer, since there
+        is nobody to play for them.
+        """
+        for player in data.players:
+            if not isinstance(player, RandomPlayer):
+                raise ValueError(f'Player {player.id} needs a person to play')
+
+        self.data = data
+        self.data.max_turns = num_turns
+        self.last_move = None
+        self._turn = 0
+        self._current_player_index = 0
+
+    def current_turn(self) -> int:
+        """Return the current turn.
+        """
+        return self._turn
+
+    def current_player(self) -> Player:
+        """Return the player whose turn it is.
+        """
+        return self.data.players[self._current_player_index]
+
+    def is_over(self) -> bool:
+        """Return True iff all of the turns of this game have been played.
+        """
+        return self._turn >= self.data.max_turns
+
+    def step(self) -> Optional[Tuple[str, Optional[int]]]:
+        """Let the current player make one move and advance to the next player.
+
+        Return the action that was done, or None if the game is over or the
+        player's move was not valid.
+        """
+        if self.is_over():
+            return None
+
+        player = self.current_player()
+        player.proceed()
+        start = time.perf_counter()
+        move = player.generate_move(self.data.board)
+        generate_seconds = time.perf_counter() - start
+        if move is None:
+            return None
+        valid = self.data.do_move(player, move)
+        if self.data.telemetry is not None:
+            start = time.perf_counter()
+            score = self.data.calculate_score(player.id)
+            score_seconds = time.perf_counter() - start
+            self.data.telemetry.emit(turn_record(
+                player, move, self._turn, valid, generate_seconds, score,
+                score_seconds))
+        if not valid:
+            return None
+        self.last_move = move
+
+        self._current_player_index = (self._current_player_index + 1) % len(
+            self.data.players)
+        if self._current_player_index == 0:
+            self._turn += 1
+        return move[0], move[1]
+
+    def run(self) -> List[Tuple[int, int, int]]:
+        """Play the rest of this game and return a list of tuples containing
+        each player's ID, goal score, and penalty.
+        """
+        while not self.is_over():
+            self.step()
+        return self.scores()
+
+    def scores(self) -> List[Tuple[int, int, int]]:
+        """Return a list of tuples containing each player's ID, goal score,
+        and penalty, as of now.
+        """
+        scores = []
+        for p in self.data.players:
+            goal_score, penalty = self.data.calculate_score(p.id)
+            scores.append((p.id, goal_score, penalty))
+        return scores
+
+    def winner(self) -> int:
+        """Return the ID of the player with the highest score, as of now.
+        """
+        return max(self.scores(), key=lambda item: item[1] - item[2])[0]
+
+
+def create_simulator(max_depth: int, num_random: int,
+                     smart_players: List[int], num_turns: int,
+                     seed: Optional[int] = None,
+                     record: bool = False) -> Simulator:
+    """Return a Simulator for a game like Game(max_depth, 0, num_random,
+    smart_players) that will stop after <num_turns>.
+
+    If <seed> is not None, the random module is seeded with it first, so that
+    the same seed always gives the same game. If <record> is True, the moves
+    of the game are recorded in a MoveLog (see replay.py), which needs a seed
+    to be able to rebuild the board; if <seed> is None, the board is
+    generated from a randomly chosen seed of its own, without seeding the
+    random module.
+    """
+    if seed is not None:
+        random.seed(seed)
+        board = generate_board(max_depth, BOARD_SIZE)
+    elif record:
+        seed = random.getrandbits(32)
+        board = generate_board(max_depth, BOARD_SIZE, random.Random(seed))
+    else:
+        board = generate_board(max_depth, BOARD_SIZE)
+    players = create_players(0, num_random, smart_players)
+    data = GameData(board, players)
+    if record:
+        data.log = MoveLog(seed, max_depth, BOARD_SIZE,
+                           [p.goal.colour for p in players])
+    return Simulator(data, num_turns)
+
+
+if __name__ == '__main__':
+    import time
+
+    # Play the same games as create_auto_game, as fast as possible
+    num_games = 100
+    start = time.perf_counter()
+    for game_seed in range(num_games):
+        create_simulator(3, 0, [5, 10], 5, game_seed).run()
+    elapsed = time.perf_counter() - start
+    print(f'{num_games} games in {elapsed:.2f}s '
+          f'({num_games / elapsed:.1f} games/sec)')
@@ -0,0 +1,267 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a stream of telemetry: one record for every move that a
+player makes, or tries to make, in a game.
+
+Each record is a dictionary with:
+    turn: the turn the move was made on
+    player: the ID of the player
+    action: the label of the action, as in ACTION_LABEL
+    level: the level of the block the move was made on
+    valid: whether the move was successful
+    generate_seconds: the time the player took to generate the move
+    score_seconds: the time the game took to score the board after the move
+    score: the player's goal score after the move
+    penalty: the player's penalty after the move
+
+A game emits records to a Telemetry, which hands them to a background thread
+through a bounded queue, so the game never waits for a record to be written.
+If the queue is full, the record is dropped and counted instead. The thread
+writes every record to each of the Telemetry's sinks: a JsonlSink writes them
+to a file, one JSON object per line, and a RingBufferSink keeps the most
+recent ones in memory. A sink that fails to write a record is counted as an
+error, and does not stop the record being written to the other sinks.
+
+To receive records, set the telemetry attribute of a game's GameData.
+"""
+from __future__ import annotations
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import collections
+import json
+import queue
+import threading
+
+from actions import ACTION_LABEL
+from block import Block
+from player import Player
+
+
+class TelemetrySink:
+    """A destination for telemetry records.
+    """
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Write <record>.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finish writing records. No more records are written after this.
+        """
+
+
+class JsonlSink(TelemetrySink):
+    """Writes telemetry records to a file, one JSON object per line.
+    """
+    # === Private Attributes ===
+    # _file:
+    #   The file that records are written to.
+    _file: Any
+
+    def __init__(self, path: str) -> None:
+        """Initialize a sink that writes to the file at <path>, replacing
+        anything already in it.
+        """
+        self._file = open(path, 'w')
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record) + '\n')
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class RingBufferSink(TelemetrySink):
+    """Keeps the most recent telemetry records in memory.
+
+    === Public Attributes ===
+    capacity:
+        The largest number of records that are kept. Older records are
+        forgotten to make room for new ones.
+    """
+    # === Private Attributes ===
+    # _records:
+    #   The records that are kept, oldest first.
+    # _lock:
+    #   Held while the records are changed or read.
+    capacity: int
+    _records: Deque[Dict[str, Any]]
+    _lock: threading.Lock
+
+    def __init__(self, capacity: int = 1000) -> None:
+        """Initialize an empty sink that keeps up to <capacity> records.
+
+        Precondition: capacity >= 1
+        """
+        self.capacity = capacity
+        self._records = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Return the records that are kept, oldest first.
+        """
+        with self._lock:
+            return list(self._records)
+
+
+class Telemetry:
+    """Hands telemetry records to its sinks on a background thread.
+
+    === Public Attributes ===
+    emitted:
+        The number of records that were queued to be written.
+    dropped:
+        The number of records that were dropped because the queue was full,
+        or because this Telemetry was closed.
+    errors:
+        The number of times a sink failed to write a record.
+    """
+    # === Private Attributes ===
+    # _sinks:
+    #   The sinks that every record is written to.
+    # _pending:
+    #   The records that have not been written yet, followed by None once
+    #   this Telemetry is closed.
+    # _thread:
+    #   The thread that writes records.
+    # _closed:
+    #   Whether this Telemetry has been closed.
+    emitted: int
+    dropped: int
+    errors: int
+    _sinks: List[TelemetrySink]
+    _pending: queue.Queue
+    _thread: threading.Thread
+    _closed: bool
+
+    def __init__(self, sinks: List[TelemetrySink],
+                 max_pending: int = 1024) -> None:
+        """Initialize a Telemetry that writes to <sinks>, holding up to
+        <max_pending> records that have not been written yet.
+
+        Precondition: max_pending >= 1
+        """
+        self.emitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self._sinks = sinks
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    def __enter__(self) -> Telemetry:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        """Queue <record> to be written to every sink, without waiting. If
+        too many records are waiting to be written, or this Telemetry is
+        closed, <record> is dropped.
+        """
+        if self._closed:
+            self.dropped += 1
+            return
+        try:
+            self._pending.put_nowait(record)
+            self.emitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Wait until every queued record has been written.
+        """
+        self._pending.join()
+
+    def close(self) -> None:
+        """Write every queued record, then stop the background thread and
+        close every sink, even if some of them fail to close.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._thread.join()
+        for sink in self._sinks:
+            try:
+                sink.close()
+            except Exception:
+                self.errors += 1
+
+    def _write(self) -> None:
+        """Write queued records until this Telemetry is closed.
+        """
+        while True:
+            record = self._pending.get()
+            try:
+                if record is None:
+                    return
+                for sink in self._sinks:
+                    try:
+                        sink.write(record)
+                    except Exception:
+                        self.errors += 1
+            finally:
+                self._pending.task_done()
+
+
+def turn_record(player: Player, move: Tuple[str, Optional[int], Block],
+                turn: int, valid: bool, generate_seconds: float,
+                score: Tuple[int, int], score_seconds: float) \
+        -> Dict[str, Any]:
+    """Return the telemetry record of <move> by <player> on <turn>, which
+    took <generate_seconds> to generate. <valid> is whether the move was
+    successful.
+
+    <score> is the player's goal score and penalty after the move, which the
+    game took <score_seconds> to calculate. Nothing is scored here, so that
+    making a record does not slow the game down.
+    """
+    return {
+        'turn': turn,
+        'player': player.id,
+        'action': ACTION_LABEL[(move[0], move[1])],
+        'level': move[2].level,
+        'valid': valid,
+        'generate_seconds': generate_seconds,
+        'score_seconds': score_seconds,
+        'score': score[0],
+        'penalty': score[1]
+    }
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-io': ['JsonlSink.__init__'],
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'collections',
+            'json', 'queue', 'threading', 'actions', 'block', 'player'
+        ]
+    })
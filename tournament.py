@@ -0,0 +1,215 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin
+
+=== Module Description ===
+
+This file contains a tournament runner that plays many seeded games between
+computer players on all of the CPU cores, and summarises how well each type of
+player did.
+
+Each finished game is written as one line of JSON to the results file as soon
+as it completes, so a tournament that is stopped part of the way through can
+be resumed by running it again with the same results file.
+
+For example, to compare the players of create_auto_game over 1000 games:
+
+    python tournament.py --games 1000 --smart 5 10 --output results.jsonl
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set
+import argparse
+import json
+import os
+
+from actions import ACTION_PENALTY, SMASH, COMBINE, PAINT
+from player import Player, SmartPlayer
+from simulator import create_simulator
+
+
+def player_type(player: Player) -> str:
+    """Return the name used to group <player> with players of the same type
+    in a tournament summary.
+    """
+    if isinstance(player, SmartPlayer):
+        return f'SmartPlayer({player.difficulty})'
+    return type(player).__name__
+
+
+def play_game(seed: int, max_depth: int, num_random: int,
+              smart_players: List[int], num_turns: int) -> Dict[str, Any]:
+    """Play one headless game with <seed> and return a record of its result
+    that can be written as JSON.
+    """
+    sim = create_simulator(max_depth, num_random, smart_players, num_turns,
+                           seed)
+    sim.run()
+    data = sim.data
+
+    players = []
+    for p in data.players:
+        goal_score, penalty = data.calculate_score(p.id)
+        players.append({
+            'id': p.id,
+            'type': player_type(p),
+            'goal': type(p.goal).__name__,
+            'score': goal_score,
+            'penalty': penalty,
+            'smash_penalty': data.smashes[p.id] * ACTION_PENALTY[SMASH],
+            'combine_penalty': data.combines[p.id] * ACTION_PENALTY[COMBINE],
+            'paint_penalty': data.paints[p.id] * ACTION_PENALTY[PAINT]
+        })
+    return {'seed': seed, 'winner': sim.winner(), 'players': players}
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """Return the game records already written to the results file at <path>.
+
+    A partly written last line (e.g. from a tournament that was killed) is
+    ignored. If there is no file at <path>, return an empty list.
+    """
+    if not os.path.exists(path):
+        return []
+    results = []
+    with open(path) as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return results
+
+
+def run_tournament(path: str, num_games: int, max_depth: int,
+                   num_random: int, smart_players: List[int], num_turns: int,
+                   first_seed: int = 0, workers: Optional[int] = None) \
+        -> List[Dict[str, Any]]:
+    """Play the games with seeds first_seed to first_seed + num_games - 1 that
+    are not already in the results file at <path>, appending each result to
+    the file as it completes. Return the records of all of the games.
+
+    The games are shared between <workers> processes (by default, one per
+    CPU core). If <workers> is 0, the games are played in this process.
+    """
+    results = load_results(path)
+    done: Set[int] = {r['seed'] for r in results}
+    seeds = [s for s in range(first_seed, first_seed + num_games)
+             if s not in done]
+
+    # Rewrite the file, in case its last line was only partly written
+    with open(path, 'w') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
+
+    with open(path, 'a') as f:
+        def record(result: Dict[str, Any]) -> None:
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            results.append(result)
+
+        config = (max_depth, num_random, smart_players, num_turns)
+        if workers == 0:
+            for seed in seeds:
+                record(play_game(seed, *config))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [pool.submit(play_game, seed, *config)
+                           for seed in seeds]
+                for future in as_completed(futures):
+                    record(future.result())
+
+    return results
+
+
+def _percentile(values: List[int], fraction: float) -> int:
+    """Return the value at <fraction> of the way through the sorted <values>.
+
+    Precondition: len(values) >= 1
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarise(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Return the win rate, score distribution and average penalties of each
+    type of player over the games in <results>.
+    """
+    by_type: Dict[str, List[Dict[str, Any]]] = {}
+    wins: Dict[str, int] = {}
+    for result in results:
+        for p in result['players']:
+            by_type.setdefault(p['type'], []).append(p)
+            if p['id'] == result['winner']:
+                wins[p['type']] = wins.get(p['type'], 0) + 1
+
+    summary = {}
+    for kind, records in by_type.items():
+        totals = [p['score'] - p['penalty'] for p in records]
+        n = len(records)
+        summary[kind] = {
+            'games': n,
+            'wins': wins.get(kind, 0),
+            'win_rate': wins.get(kind, 0) / n,
+            'mean_score': sum(totals) / n,
+            'score_quartiles': [_percentile(totals, q)
+                                for q in (0, 0.25, 0.5, 0.75, 1)],
+            'mean_smash_penalty': sum(p['smash_penalty']
+                                      for p in records) / n,
+            'mean_combine_penalty': sum(p['combine_penalty']
+                                        for p in records) / n,
+            'mean_paint_penalty': sum(p['paint_penalty']
+                                      for p in records) / n
+        }
+    return summary
+
+
+def _print_summary(summary: Dict[str, Dict[str, Any]]) -> None:
+    """Print <summary> as a table, one row for each type of player.
+    """
+    print(f'{"player":<18}{"games":>7}{"win %":>8}{"mean":>8}  '
+          f'{"min/25/50/75/max":<22}{"smash":>7}{"combine":>9}{"paint":>7}')
+    for kind, s in sorted(summary.items()):
+        quartiles = '/'.join(str(q) for q in s['score_quartiles'])
+        print(f'{kind:<18}{s["games"]:>7}{100 * s["win_rate"]:>8.1f}'
+              f'{s["mean_score"]:>8.2f}  {quartiles:<22}'
+              f'{s["mean_smash_penalty"]:>7.2f}'
+              f'{s["mean_combine_penalty"]:>9.2f}'
+              f'{s["mean_paint_penalty"]:>7.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Play many headless games of Blocky in parallel.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--random', type=int, default=0,
+                        help='the number of random players')
+    parser.add_argument('--smart', type=int, nargs='*', default=[5, 10],
+                        help='the difficulty of each smart player')
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the number of processes (default: one per core)')
+    parser.add_argument('--output', default='tournament.jsonl',
+                        help='the results file, which is resumed if it exists')
+    args = parser.parse_args()
+
+    _print_summary(summarise(run_tournament(
+        args.output, args.games, args.depth, args.random, args.smart,
+        args.turns, args.first_seed, args.workers)))